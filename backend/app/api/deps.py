@@ -2,15 +2,17 @@
 Dependency injection functions.
 Cung cấp common dependencies cho FastAPI endpoints.
 """
-from typing import Generator
+from typing import Callable, Generator
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session
 
 from app.core.config import settings
+from app.db import session as db_session
 from app.db.session import get_session
 from app.models.user import User
+from app.services.dictionary_service import DictionaryService
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login") 
@@ -27,6 +29,28 @@ def get_db() -> Generator[Session, None, None]:
     yield from get_session()
 
 
+def get_session_factory() -> Callable[[], Session]:
+    """
+    Get factory tạo database session mới.
+    Dùng cho StreamingResponse: session của get_db đã đóng trước khi body được gửi.
+    
+    Returns:
+        Callable trả về Session (dùng với `with`)
+    """
+    # Đọc db_session.engine lúc gọi (không bind lúc import) để engine override được áp dụng
+    return lambda: Session(db_session.engine)
+
+
+def get_dictionary_service(db: Session = Depends(get_db)) -> DictionaryService:
+    """
+    Get dictionary service dependency.
+    
+    Returns:
+        DictionaryService dùng chung session của request
+    """
+    return DictionaryService(db)
+
+
 async def get_current_user(
     db: Session = Depends(get_db),
     token: str = Depends(oauth2_scheme)
@@ -3,9 +3,9 @@ Vocabulary API Router - Các endpoints quản lý từ vựng.
 Updated để hỗ trợ multiple meanings và import/export.
 """
 import json
-from typing import Optional, Literal
-from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, BackgroundTasks
-from fastapi.responses import PlainTextResponse, StreamingResponse
+from typing import Callable, Optional, Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, status, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
 
 from app.api import deps
@@ -27,6 +27,7 @@ from app.schemas.vocabulary import (
 )
 from app.schemas.quiz import QuizSessionResponse, QuizSubmit
 from app.services.vocabulary_service import VocabularyService
+from app.services.dictionary_service import DictionaryService
 
 router = APIRouter()
 
@@ -73,7 +74,8 @@ async def import_vocabularies(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
     import_data: VocabularyImportRequest,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    dictionary_service: DictionaryService = Depends(deps.get_dictionary_service)
 ):
     """
     Import từ vựng từ nội dung TXT.
@@ -83,7 +85,7 @@ async def import_vocabularies(
     Nếu word đã tồn tại, sẽ merge thêm meaning mới.
     Nếu không có definition và auto_fetch_meaning=True, sẽ tự động fetch từ API.
     """
-    service = VocabularyService(db)
+    service = VocabularyService(db, dictionary_service)
     result = await service.import_from_txt(
         user_id=current_user.id,
         content=import_data.content,
@@ -180,10 +182,17 @@ async def import_vocabularies_stream(
 
 
 
+EXPORT_MEDIA_TYPES = {
+    "json": "application/json",
+    "txt": "text/plain",
+    "csv": "text/csv",
+}
+
+
 @router.get("/export")
 def export_vocabularies(
     *,
-    db: Session = Depends(deps.get_db),
+    session_factory: Callable[[], Session] = Depends(deps.get_session_factory),
     current_user: User = Depends(deps.get_current_user),
     format: Literal["json", "txt", "csv"] = Query("json", description="Format export"),
     page: Optional[int] = Query(None, ge=1, description="Page number (optional, None = all)")
@@ -194,32 +203,23 @@ def export_vocabularies(
     - **json**: JSON với đầy đủ thông tin
     - **txt**: word|definition|example (mỗi dòng một meaning)
     - **csv**: CSV với header
+    
+    Response được stream theo từng đoạn, không build toàn bộ nội dung trong memory.
     """
-    service = VocabularyService(db)
-    content = service.export_vocabularies(
-        user_id=current_user.id,
-        format=format,
-        page=page
-    )
+    # Lưu user_id trước khi vào generator (tránh detached session)
+    user_id = current_user.id
     
-    # Set appropriate content type
-    if format == "json":
-        return Response(
-            content=content,
-            media_type="application/json",
-            headers={"Content-Disposition": "attachment; filename=vocabularies.json"}
-        )
-    elif format == "csv":
-        return Response(
-            content=content,
-            media_type="text/csv",
-            headers={"Content-Disposition": "attachment; filename=vocabularies.csv"}
-        )
-    else:  # txt
-        return PlainTextResponse(
-            content=content,
-            headers={"Content-Disposition": "attachment; filename=vocabularies.txt"}
-        )
+    def content_generator():
+        """Generator stream nội dung export với session riêng."""
+        with session_factory() as db:
+            service = VocabularyService(db)
+            yield from service.iter_export(user_id=user_id, format=format, page=page)
+    
+    return StreamingResponse(
+        content_generator(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=vocabularies.{format}"}
+    )
 
 
 # ============= CRUD Endpoints =============
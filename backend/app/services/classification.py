@@ -0,0 +1,60 @@
+"""
+Word classification - Phân loại từ thành Function Word hoặc Content Word.
+Hàm thuần (không phụ thuộc database) nên có thể cache theo từ.
+"""
+from functools import lru_cache
+
+from app.models.enums import WordType
+
+
+# Danh sách Function Words tiêu chuẩn (frozenset: lookup O(1), không bị sửa lúc runtime)
+FUNCTION_WORDS: frozenset[str] = frozenset({
+    # Articles
+    "a", "an", "the",
+    # Prepositions
+    "in", "on", "at", "to", "for", "with", "by", "from", "of", "about",
+    "into", "through", "during", "before", "after", "above", "below",
+    "between", "under", "over", "out", "up", "down", "off", "against",
+    # Conjunctions
+    "and", "or", "but", "so", "yet", "nor", "for", "because", "although",
+    "while", "if", "unless", "until", "when", "where", "whether",
+    # Pronouns
+    "i", "you", "he", "she", "it", "we", "they", "me", "him", "her", "us", "them",
+    "my", "your", "his", "her", "its", "our", "their",
+    "mine", "yours", "hers", "ours", "theirs",
+    "myself", "yourself", "himself", "herself", "itself", "ourselves", "themselves",
+    "this", "that", "these", "those", "who", "whom", "whose", "which", "what",
+    # Auxiliary verbs
+    "is", "am", "are", "was", "were", "be", "been", "being",
+    "have", "has", "had", "having",
+    "do", "does", "did", "doing",
+    "will", "would", "shall", "should",
+    "can", "could", "may", "might", "must",
+    # Determiners
+    "some", "any", "no", "every", "each", "all", "both", "few", "many",
+    "much", "more", "most", "other", "another", "such",
+    # Particles
+    "not", "very", "too", "also", "just", "only", "even", "still", "already",
+})
+
+
+def normalize_word(word: str) -> str:
+    """Normalize word: trim, lowercase, remove duplicate spaces."""
+    return " ".join(word.strip().lower().split())
+
+
+@lru_cache(maxsize=65536)
+def classify_word(word: str) -> WordType:
+    """
+    Phân loại từ dựa trên danh sách FUNCTION_WORDS.
+    Kết quả được cache, import file lớn có nhiều từ trùng chỉ tính một lần.
+    
+    Args:
+        word: Từ cần phân loại (chưa cần normalize)
+        
+    Returns:
+        WordType.FUNCTION_WORD hoặc WordType.CONTENT_WORD
+    """
+    if normalize_word(word) in FUNCTION_WORDS:
+        return WordType.FUNCTION_WORD
+    return WordType.CONTENT_WORD
@@ -1,7 +1,8 @@
 """
 DictionaryService - Service để dịch từ vựng sử dụng Google Translate.
 """
-from typing import Optional, Tuple
+import asyncio
+from typing import Dict, Iterable, Optional, Tuple
 from sqlmodel import Session
 
 from app.models.enums import MeaningSource
@@ -15,6 +16,9 @@ class DictionaryService:
     Service để dịch từ vựng từ tiếng Anh sang tiếng Việt sử dụng Google Translate.
     """
     
+    # Số request dịch tối đa chạy cùng lúc trên một instance (batch lớn không dồn hết vào Google)
+    MAX_CONCURRENT_REQUESTS = 8
+    
     def __init__(self, session: Session):
         """
         Initialize dictionary service.
@@ -23,6 +27,7 @@ class DictionaryService:
             session: Database session (giữ để tương thích)
         """
         self.session = session
+        self._semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
     
     async def translate_text(self, text: str, source_lang: str = "en", target_lang: str = "vi") -> Optional[str]:
         """
@@ -44,17 +49,18 @@ class DictionaryService:
             from deep_translator import GoogleTranslator
             
             # GoogleTranslator là synchronous, chạy trong executor để không block event loop
-            import asyncio
             import functools
             
             loop = asyncio.get_event_loop()
             translator = GoogleTranslator(source=source_lang, target=target_lang)
             
-            # Dùng run_in_executor để chạy sync function trong async context
-            result = await loop.run_in_executor(
-                None, 
-                functools.partial(translator.translate, text)
-            )
+            # Dùng run_in_executor để chạy sync function trong async context,
+            # giới hạn số request đồng thời bằng semaphore
+            async with self._semaphore:
+                result = await loop.run_in_executor(
+                    None, 
+                    functools.partial(translator.translate, text)
+                )
             
             if result:
                 logger.info(f"Translated: '{text}' -> '{result}'")
@@ -84,6 +90,22 @@ class DictionaryService:
         
         return None, None
     
+    async def batch_get_definitions(
+        self, words: Iterable[str]
+    ) -> Dict[str, Tuple[Optional[str], Optional[MeaningSource]]]:
+        """
+        Lấy định nghĩa cho nhiều từ cùng lúc (song song, tối đa MAX_CONCURRENT_REQUESTS request).
+        
+        Args:
+            words: Danh sách từ cần tra cứu
+            
+        Returns:
+            Dict {word: (definition, source)}, (None, None) nếu thất bại
+        """
+        words = list(dict.fromkeys(words))
+        results = await asyncio.gather(*(self.get_definition(word) for word in words))
+        return dict(zip(words, results))
+    
     def cleanup_expired_cache(self) -> int:
         """
         Không còn sử dụng cache - giữ method để tương thích.
@@ -2,7 +2,8 @@
 Factory để chọn strategy phù hợp cho question generation.
 """
 import random
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Type
 from app.models.vocabulary import Vocabulary
 from app.models.enums import WordType, QuestionDifficulty
 from app.services.question_generator.base import QuestionGeneratorStrategy
@@ -31,6 +32,17 @@ FUNCTION_WORD_STRATEGIES = [
 ]
 
 
+@lru_cache(maxsize=None)
+def _get_strategy_instance(
+    strategy_class: Type[QuestionGeneratorStrategy]
+) -> QuestionGeneratorStrategy:
+    """
+    Trả về instance dùng chung cho mỗi strategy class.
+    Strategies không giữ state nên không cần khởi tạo lại mỗi lần chọn.
+    """
+    return strategy_class()
+
+
 class QuestionGeneratorFactory:
     """
     Factory để chọn strategy phù hợp dựa trên word_type và context.
@@ -54,7 +66,7 @@ class QuestionGeneratorFactory:
         # Content Word → Random từ 5 strategies
         if vocabulary.word_type == WordType.CONTENT_WORD:
             strategy_class = random.choice(CONTENT_WORD_STRATEGIES)
-            return strategy_class()
+            return _get_strategy_instance(strategy_class)
         
         # Function Word → Fill Blank hoặc MCQ
         # Ưu tiên MCQ cho new words (dễ hơn)
@@ -63,10 +75,12 @@ class QuestionGeneratorFactory:
         
         if is_new:
             # New word: 70% MCQ, 30% Fill Blank
-            return MCQStrategy() if random.random() < 0.7 else FillBlankStrategy()
+            strategy_class = MCQStrategy if random.random() < 0.7 else FillBlankStrategy
         else:
             # Learned word: 40% MCQ, 60% Fill Blank
-            return MCQStrategy() if random.random() < 0.4 else FillBlankStrategy()
+            strategy_class = MCQStrategy if random.random() < 0.4 else FillBlankStrategy
+        
+        return _get_strategy_instance(strategy_class)
     
     @staticmethod
     def generate_multiple_questions(
@@ -97,16 +111,19 @@ class QuestionGeneratorFactory:
             
             if count >= len(CONTENT_WORD_STRATEGIES):
                 # Mỗi type 1 lần trước
-                strategies_to_use = [s() for s in CONTENT_WORD_STRATEGIES]
+                strategies_to_use = [_get_strategy_instance(s) for s in CONTENT_WORD_STRATEGIES]
                 # Random thêm cho đủ count
                 remaining = count - len(strategies_to_use)
                 for _ in range(remaining):
-                    strategies_to_use.append(random.choice(CONTENT_WORD_STRATEGIES)())
+                    strategies_to_use.append(_get_strategy_instance(random.choice(CONTENT_WORD_STRATEGIES)))
             else:
                 # Ít hơn 5: random chọn nhưng ưu tiên không trùng lặp
                 possible_strategies = list(CONTENT_WORD_STRATEGIES)
                 random.shuffle(possible_strategies)
-                strategies_to_use = [possible_strategies[i % len(possible_strategies)]() for i in range(count)]
+                strategies_to_use = [
+                    _get_strategy_instance(possible_strategies[i % len(possible_strategies)])
+                    for i in range(count)
+                ]
             
             random.shuffle(strategies_to_use)
             
@@ -121,10 +138,8 @@ class QuestionGeneratorFactory:
             # Function Word: MCQ + Fill Blank
             for i in range(count):
                 # Xen kẽ MCQ và Fill Blank
-                if i % 2 == 0:
-                    strategy = MCQStrategy()
-                else:
-                    strategy = FillBlankStrategy()
+                strategy_class = MCQStrategy if i % 2 == 0 else FillBlankStrategy
+                strategy = _get_strategy_instance(strategy_class)
                 question_data = strategy.generate(vocabulary, difficulty, distractors)
                 questions.append(question_data)
         
@@ -2,16 +2,18 @@
 Vocabulary Service Layer - Business logic cho vocabulary management và SRS.
 Updated để hỗ trợ multiple meanings và import/export.
 """
+import asyncio
 import csv
 import io
 import json
 from datetime import datetime
-from typing import Optional, List, Generator, Literal
+from typing import Optional, Dict, List, Generator, Iterable, Literal
 from dataclasses import dataclass, field
 
 from sqlmodel import Session, select, func, and_
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import selectinload
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import raiseload, selectinload
 
 from app.models.vocabulary import Vocabulary
 from app.models.vocabulary_meaning import VocabularyMeaning
@@ -33,41 +35,11 @@ from app.core.logging import get_logger
 from app.core.srs_engine import SRSEngine, SRSState, ReviewQuality as SRSReviewQuality
 from app.ai.factory import get_ai_provider
 from app.services.dictionary_service import DictionaryService
+from app.services.classification import FUNCTION_WORDS, classify_word, normalize_word
 
 logger = get_logger(__name__)
 
 
-# Danh sách Function Words tiêu chuẩn
-FUNCTION_WORDS = {
-    # Articles
-    "a", "an", "the",
-    # Prepositions
-    "in", "on", "at", "to", "for", "with", "by", "from", "of", "about",
-    "into", "through", "during", "before", "after", "above", "below",
-    "between", "under", "over", "out", "up", "down", "off", "against",
-    # Conjunctions
-    "and", "or", "but", "so", "yet", "nor", "for", "because", "although",
-    "while", "if", "unless", "until", "when", "where", "whether",
-    # Pronouns
-    "i", "you", "he", "she", "it", "we", "they", "me", "him", "her", "us", "them",
-    "my", "your", "his", "her", "its", "our", "their",
-    "mine", "yours", "hers", "ours", "theirs",
-    "myself", "yourself", "himself", "herself", "itself", "ourselves", "themselves",
-    "this", "that", "these", "those", "who", "whom", "whose", "which", "what",
-    # Auxiliary verbs
-    "is", "am", "are", "was", "were", "be", "been", "being",
-    "have", "has", "had", "having",
-    "do", "does", "did", "doing",
-    "will", "would", "shall", "should",
-    "can", "could", "may", "might", "must",
-    # Determiners
-    "some", "any", "no", "every", "each", "all", "both", "few", "many",
-    "much", "more", "most", "other", "another", "such",
-    # Particles
-    "not", "very", "too", "also", "just", "only", "even", "still", "already",
-}
-
-
 @dataclass
 class ImportResult:
     """Kết quả của quá trình import từ vựng."""
@@ -87,19 +59,23 @@ class VocabularyService:
     Implement business logic cho CRUD operations, SRS algorithm, import/export.
     """
     
+    # Số tham số tối đa trong một mệnh đề IN (SQLite giới hạn số biến trên mỗi câu SQL)
+    IN_CHUNK_SIZE = 900
+    
     # Question Pool Management Constants
     MAX_POOL_SIZE = 5        # Tối đa 5 câu hỏi cho mỗi từ vựng
     USAGE_THRESHOLD = 3      # Mỗi câu dùng tối đa 3 lần trước khi refresh
     
-    def __init__(self, session: Session):
+    def __init__(self, session: Session, dictionary_service: Optional[DictionaryService] = None):
         """
         Initialize vocabulary service.
         
         Args:
             session: Database session
+            dictionary_service: DictionaryService inject từ ngoài (optional, mặc định lazy-load)
         """
         self.session = session
-        self._dictionary_service: Optional[DictionaryService] = None
+        self._dictionary_service: Optional[DictionaryService] = dictionary_service
     
     @property
     def dictionary_service(self) -> DictionaryService:
@@ -111,7 +87,7 @@ class VocabularyService:
     @staticmethod
     def normalize_word(word: str) -> str:
         """Normalize word: trim, lowercase, remove duplicate spaces."""
-        return " ".join(word.strip().lower().split())
+        return normalize_word(word)
     
     @staticmethod
     def classify_word(word: str, manual_override: Optional[WordType] = None) -> tuple[WordType, bool]:
@@ -128,9 +104,7 @@ class VocabularyService:
         if manual_override is not None:
             return manual_override, True
         
-        normalized = VocabularyService.normalize_word(word)
-        word_type = WordType.FUNCTION_WORD if normalized in FUNCTION_WORDS else WordType.CONTENT_WORD
-        return word_type, False
+        return classify_word(word), False
     
     def create_vocab(
         self,
@@ -391,6 +365,137 @@ class VocabularyService:
         
         return self.session.exec(query).first()
     
+    def _get_vocabs_by_words(self, user_id: int, words: Iterable[str]) -> Dict[str, Vocabulary]:
+        """
+        Load các vocabulary theo danh sách word (đã normalize), kèm meanings.
+        IN list được chia theo IN_CHUNK_SIZE để không vượt giới hạn số tham số của SQLite.
+        """
+        words = list(dict.fromkeys(words))
+        vocabs: Dict[str, Vocabulary] = {}
+        for start in range(0, len(words), self.IN_CHUNK_SIZE):
+            query = select(Vocabulary).where(
+                Vocabulary.user_id == user_id,
+                Vocabulary.word.in_(words[start:start + self.IN_CHUNK_SIZE])
+            ).options(selectinload(Vocabulary.meanings), raiseload("*"))
+            vocabs.update((vocab.word, vocab) for vocab in self.session.exec(query))
+        return vocabs
+    
+    def _insert_vocabs_ignore_existing(self, rows: List[dict]) -> tuple[Dict[str, int], set]:
+        """
+        Insert vocabularies theo batch, bỏ qua các word đã tồn tại (unique user_id + word).
+        
+        Args:
+            rows: Vocabulary rows đầy đủ cột (cùng một user)
+            
+        Returns:
+            Tuple (dict word -> id của các row đã insert, set các word bị bỏ qua do đã tồn tại)
+        """
+        dialect = self.session.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            dialect_insert = None
+        
+        if dialect_insert is not None:
+            stmt = dialect_insert(Vocabulary).on_conflict_do_nothing(
+                index_elements=["user_id", "word"]
+            )
+        else:
+            stmt = insert(Vocabulary)
+        
+        ids = dict(self.session.execute(
+            stmt.returning(Vocabulary.word, Vocabulary.id), rows
+        ).tuples().all())
+        
+        # Row bị bỏ qua không có trong RETURNING
+        conflicted = {row["word"] for row in rows} - ids.keys()
+        return ids, conflicted
+    
+    def _merge_conflicted_meanings(
+        self,
+        user_id: int,
+        conflicted: set,
+        meaning_rows: List[tuple[str, dict, bool]],
+        vocab_ids: Dict[str, int],
+        result: ImportResult
+    ) -> List[tuple[str, dict, bool]]:
+        """
+        Xử lý các word bị request khác tạo giữa lúc SELECT và INSERT: chuyển từ "mới" sang
+        merge, dedupe meaning rows theo meanings đã có trong database.
+        
+        Args:
+            meaning_rows: (word, meaning row, đã tính vào merged_meanings hay chưa)
+        
+        Returns:
+            meaning_rows sau khi bỏ các definition đã tồn tại
+        """
+        raced = self._get_vocabs_by_words(user_id, conflicted)
+        vocab_ids.update((word, vocab.id) for word, vocab in raced.items())
+        result.new_words -= len(conflicted)
+        
+        known_definitions = {
+            word: {m.definition.lower().strip() for m in vocab.meanings}
+            for word, vocab in raced.items()
+        }
+        merged_rows = []
+        for word, row, is_merge in meaning_rows:
+            if word in known_definitions:
+                if not self._add_if_new_definition(known_definitions[word], row["definition"]):
+                    # Definition đã có trong database: bỏ row (và bỏ lượt merge đã tính nếu có)
+                    if is_merge:
+                        result.merged_meanings -= 1
+                    continue
+                # Meaning của lần "tạo mới" giờ là meaning merge vào word có sẵn
+                if not is_merge:
+                    result.merged_meanings += 1
+                    is_merge = True
+            merged_rows.append((word, row, is_merge))
+        return merged_rows
+    
+    @staticmethod
+    def _add_if_new_definition(known_definitions: set, definition: str) -> bool:
+        """Ghi nhận definition (so sánh không phân biệt hoa thường/khoảng trắng), False nếu đã có."""
+        normalized = definition.lower().strip()
+        if normalized in known_definitions:
+            return False
+        known_definitions.add(normalized)
+        return True
+    
+    @staticmethod
+    def _parse_import_content(content: str) -> List[tuple[int, List[str]]]:
+        """
+        Parse nội dung TXT import: word|definition|example.
+        
+        Dùng csv.reader (implement bằng C) thay vì split từng dòng. QUOTE_NONE để
+        dấu nháy trong definition được giữ nguyên như trước. Nếu csv.reader từ chối
+        input (vd: field vượt csv.field_size_limit), parse lại bằng str.split.
+        
+        Returns:
+            List (line_num, parts), đã bỏ dòng trống và dòng comment (#)
+        """
+        content = content.strip()
+        reader = csv.reader(io.StringIO(content), delimiter="|", quoting=csv.QUOTE_NONE)
+        rows = []
+        try:
+            for parts in reader:
+                first = parts[0].strip() if parts else ""
+                if (len(parts) <= 1 and not first) or first.startswith('#'):
+                    continue
+                rows.append((reader.line_num, parts))
+            return rows
+        except csv.Error as e:
+            logger.warning(f"csv parse failed at line {reader.line_num} ({e}), falling back to str.split")
+        
+        rows = []
+        for line_num, line in enumerate(content.split('\n'), 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            rows.append((line_num, line.split('|')))
+        return rows
+    
     async def import_from_txt(
         self,
         user_id: int,
@@ -413,48 +518,72 @@ class VocabularyService:
             ImportResult với thống kê chi tiết
         """
         result = ImportResult()
-        lines = content.strip().split('\n')
+        rows = self._parse_import_content(content)
         
-        logger.info(f"Starting import: {len(lines)} lines, auto_fetch={auto_fetch_meaning}")
+        logger.info(f"Starting import: {len(rows)} lines, auto_fetch={auto_fetch_meaning}")
         
-        # Process từng dòng
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            
+        # Chuẩn hoá toàn bộ dòng trước khi gọi dictionary/database
+        entries = []
+        for line_num, parts in rows:
             result.total_processed += 1
+            word = self.normalize_word(parts[0]) if parts else ""
             
+            if not word:
+                result.warnings.append(f"Line {line_num}: Empty word")
+                continue
+            
+            definition = parts[1].strip() if len(parts) > 1 and parts[1].strip() else None
+            entries.append((line_num, word, definition))
+        
+        # Gọi dictionary song song: dịch các definition có sẵn + một batch cho các từ thiếu definition.
+        # Definition trùng chỉ dịch một lần; DictionaryService tự giới hạn số request đồng thời
+        definitions = list(dict.fromkeys(definition for _, _, definition in entries if definition))
+        missing_words = [word for _, word, definition in entries if not definition]
+        
+        async def fetch_missing() -> dict:
+            if not (auto_fetch_meaning and missing_words):
+                return {}
+            return await self.dictionary_service.batch_get_definitions(missing_words)
+        
+        translations, fetched = await asyncio.gather(
+            asyncio.gather(*(self.dictionary_service.translate_text(d) for d in definitions)),
+            fetch_missing()
+        )
+        translated_by_definition = dict(zip(definitions, translations))
+        
+        # Load các vocabulary đã tồn tại trong một query (kèm meanings)
+        existing_by_word = self._get_vocabs_by_words(user_id, [word for _, word, _ in entries])
+        known_definitions = {
+            word: {m.definition.lower().strip() for m in vocab.meanings}
+            for word, vocab in existing_by_word.items()
+        }
+        # Gom rows để insert theo batch: word -> vocabulary row, (word, meaning row, là merge)
+        new_vocab_rows = {}
+        meaning_rows = []
+        touched_words = {}  # Giữ thứ tự dòng cho created_vocab_ids
+        now = datetime.utcnow()
+        
+        for line_num, word, definition in entries:
             try:
-                # Parse: word|definition|example
-                parts = line.split('|')
-                word = self.normalize_word(parts[0]) if parts else ""
-                
-                if not word:
-                    result.warnings.append(f"Line {line_num}: Empty word")
-                    continue
-                
-                definition = parts[1].strip() if len(parts) > 1 and parts[1].strip() else None
-                
                 # Xác định definition
                 final_definition = None
                 meaning_source = MeaningSource.MANUAL
                 is_auto = False
                 
-                # Dịch definition nếu có
+                # Definition có sẵn: dùng bản dịch nếu có
                 if definition:
-                    translated = await self.dictionary_service.translate_text(definition)
+                    translated = translated_by_definition.get(definition)
                     final_definition = translated if translated else definition
                     if translated:
                         meaning_source = MeaningSource.AUTO_TRANSLATE
                         is_auto = True
                 
-                # Dịch từ nếu không có definition và auto_fetch = True
-                elif auto_fetch_meaning:
-                    translated = await self.dictionary_service.translate_text(word)
-                    if translated:
-                        final_definition = translated
-                        meaning_source = MeaningSource.AUTO_TRANSLATE
+                # Không có definition: dùng kết quả fetch tự động
+                elif word in fetched:
+                    fetched_definition, source = fetched[word]
+                    if fetched_definition:
+                        final_definition = fetched_definition
+                        meaning_source = source
                         is_auto = True
                         result.auto_generated_count += 1
                 
@@ -462,21 +591,75 @@ class VocabularyService:
                 if not final_definition:
                     result.failed_auto_meaning.append(word)
                     result.warnings.append(f"Line {line_num}: No definition for '{word}'")
-                    self._create_or_merge_vocab(user_id, word, None, result)
-                    continue
                 
-                # Tạo hoặc merge vocabulary
-                self._create_or_merge_vocab(
-                    user_id, word, final_definition,
-                    result, meaning_source, is_auto
-                )
+                is_new = word not in known_definitions
+                if is_new:
+                    # Tạo mới: bulk insert không áp dụng default phía Python nên điền đủ các cột
+                    word_type, is_manual = self.classify_word(word)
+                    new_vocab_rows[word] = {
+                        "user_id": user_id,
+                        "word": word,
+                        "word_type": word_type,
+                        "is_word_type_manual": is_manual,
+                        "easiness_factor": 2.5,
+                        "interval": 0,
+                        "repetitions": 0,
+                        "next_review_date": now,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    known_definitions[word] = set()
+                    result.new_words += 1
+                touched_words.setdefault(word, None)
+                
+                # Thêm meaning nếu chưa có (merge khi word đã tồn tại)
+                if final_definition:
+                    if self._add_if_new_definition(known_definitions[word], final_definition):
+                        meaning_rows.append((word, {
+                            "definition": final_definition,
+                            "meaning_source": meaning_source,
+                            "is_auto_generated": is_auto,
+                            "created_at": now,
+                            "updated_at": now,
+                        }, not is_new))
+                        if not is_new:
+                            result.merged_meanings += 1
                 
             except Exception as e:
                 result.errors.append(f"Line {line_num}: {str(e)}")
                 logger.error(f"Import error at line {line_num}: {e}")
         
-        # Commit
-        self.session.commit()
+        # Một INSERT ... ON CONFLICT DO NOTHING RETURNING cho vocabularies mới,
+        # một executemany cho meanings
+        try:
+            vocab_ids = {word: vocab.id for word, vocab in existing_by_word.items()}
+            if new_vocab_rows:
+                inserted_ids, conflicted = self._insert_vocabs_ignore_existing(
+                    list(new_vocab_rows.values())
+                )
+                vocab_ids.update(inserted_ids)
+                if conflicted:
+                    meaning_rows = self._merge_conflicted_meanings(
+                        user_id, conflicted, meaning_rows, vocab_ids, result
+                    )
+            if meaning_rows:
+                self.session.execute(insert(VocabularyMeaning), [
+                    {**row, "vocabulary_id": vocab_ids[word]} for word, row, _ in meaning_rows
+                ])
+            result.created_vocab_ids.extend(vocab_ids[word] for word in touched_words)
+            
+            # Commit
+            self.session.commit()
+        except SQLAlchemyError as e:
+            # Batch insert thất bại thì cả import bị rollback: báo lỗi thay vì 500
+            self.session.rollback()
+            logger.error(f"Import batch insert failed: {e}")
+            result.errors.append(f"Database error, no words were imported: {e}")
+            result.new_words = 0
+            result.merged_meanings = 0
+            result.auto_generated_count = 0
+            result.failed_auto_meaning = []
+            result.created_vocab_ids = []
         
         logger.info(
             f"Import done: {result.new_words} new, {result.merged_meanings} merged, "
@@ -511,11 +694,10 @@ class VocabularyService:
             Dict với event type và data
         """
         result = ImportResult()
-        lines = content.strip().split('\n')
         
-        # Đếm số dòng hợp lệ
-        valid_lines = [l for l in lines if l.strip() and not l.strip().startswith('#')]
-        total = len(valid_lines)
+        # Parse trước để biết số dòng hợp lệ
+        rows = self._parse_import_content(content)
+        total = len(rows)
         
         logger.info(f"Starting streaming import: {total} valid lines, auto_fetch={auto_fetch_meaning}")
         
@@ -529,17 +711,11 @@ class VocabularyService:
         batch_buffer = []
         
         # Process từng dòng
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            
+        for line_num, parts in rows:
             processed_count += 1
             result.total_processed += 1
             
             try:
-                # Parse: word|definition|example
-                parts = line.split('|')
                 word = self.normalize_word(parts[0]) if parts else ""
                 
                 if not word:
@@ -744,29 +920,60 @@ class VocabularyService:
         Returns:
             String content theo format được chọn
         """
-        # Query vocabularies với meanings
+        return "".join(self.iter_export(user_id, format, page, page_size))
+    
+    def iter_export(
+        self,
+        user_id: int,
+        format: Literal["json", "txt", "csv"] = "json",
+        page: Optional[int] = None,
+        page_size: int = 1000,
+        yield_per: int = 500
+    ) -> Generator[str, None, None]:
+        """
+        Export vocabularies dạng stream: yield từng đoạn text thay vì build cả chuỗi.
+        
+        Args:
+            user_id: ID của user
+            format: Format export (json, txt, csv)
+            page: Page number (optional, None = all)
+            page_size: Số records mỗi page
+            yield_per: Số rows fetch mỗi lần từ database
+            
+        Returns:
+            Generator các đoạn content theo format được chọn
+            
+        Raises:
+            ValueError: Nếu format không được hỗ trợ
+        """
+        renderers = {
+            "json": self._iter_json,
+            "txt": self._iter_txt,
+            "csv": self._iter_csv,
+        }
+        if format not in renderers:
+            raise ValueError(f"Unsupported format: {format}")
+        
+        # Query vocabularies với meanings (và contexts cho cột example của TXT/CSV).
+        # raiseload("*"): relationship nào khác bị truy cập sẽ raise thay vì lazy load (N+1)
+        loaders = [selectinload(Vocabulary.meanings)]
+        if format != "json":
+            loaders.append(selectinload(Vocabulary.contexts))
         query = select(Vocabulary).where(
             Vocabulary.user_id == user_id
-        ).options(selectinload(Vocabulary.meanings))
+        ).options(*loaders, raiseload("*"))
         
         if page is not None:
             skip = (page - 1) * page_size
             query = query.offset(skip).limit(page_size)
         
-        vocabularies = list(self.session.exec(query).all())
-        
-        if format == "json":
-            return self._export_to_json(vocabularies)
-        elif format == "txt":
-            return self._export_to_txt(vocabularies)
-        elif format == "csv":
-            return self._export_to_csv(vocabularies)
-        else:
-            raise ValueError(f"Unsupported format: {format}")
+        vocabularies = self.session.exec(query.execution_options(yield_per=yield_per))
+        return renderers[format](vocabularies)
     
-    def _export_to_json(self, vocabularies: List[Vocabulary]) -> str:
-        """Export sang JSON format."""
-        data = []
+    def _iter_json(self, vocabularies: Iterable[Vocabulary]) -> Generator[str, None, None]:
+        """Export sang JSON array, mỗi vocabulary một dòng."""
+        yield "["
+        separator = "\n"
         for vocab in vocabularies:
             vocab_data = {
                 "word": vocab.word,
@@ -785,49 +992,68 @@ class VocabularyService:
                     "next_review_date": vocab.next_review_date.isoformat()
                 }
             }
-            data.append(vocab_data)
-        
-        return json.dumps(data, ensure_ascii=False, indent=2)
+            yield separator + json.dumps(vocab_data, ensure_ascii=False)
+            separator = ",\n"
+        yield "\n]\n"
     
-    def _export_to_txt(self, vocabularies: List[Vocabulary]) -> str:
+    def _iter_txt(self, vocabularies: Iterable[Vocabulary]) -> Generator[str, None, None]:
         """
         Export sang TXT format.
-        Format: word|definition|example (một dòng cho mỗi meaning)
+        Format: word|definition|example (một dòng cho mỗi meaning, bỏ example nếu không có)
         """
-        lines = []
         for vocab in vocabularies:
+            example = self._txt_field(self._export_example(vocab))
+            suffix = f"|{example}\n" if example else "\n"
+            word = self._txt_field(vocab.word)
             for meaning in vocab.meanings:
-                parts = [vocab.word, meaning.definition]
-                lines.append("|".join(parts))
-        
-        return "\n".join(lines)
+                yield f"{word}|{self._txt_field(meaning.definition)}{suffix}"
+    
+    @staticmethod
+    def _txt_field(value: str) -> str:
+        """Bỏ ký tự phân cách của format TXT ('|', xuống dòng) để dòng export import lại được."""
+        return " ".join(value.replace("|", " ").split()) if value else ""
     
-    def _export_to_csv(self, vocabularies: List[Vocabulary]) -> str:
+    @staticmethod
+    def _export_example(vocab: Vocabulary) -> str:
+        """Câu ví dụ dùng cho export: context tạo sớm nhất của vocabulary (nếu có)."""
+        if not vocab.contexts:
+            return ""
+        # Relationship/selectinload không có thứ tự: chọn theo id để kết quả ổn định
+        return min(vocab.contexts, key=lambda context: context.id).sentence
+    
+    def _iter_csv(self, vocabularies: Iterable[Vocabulary]) -> Generator[str, None, None]:
         """Export sang CSV format."""
         output = io.StringIO()
         writer = csv.writer(output)
         
+        def flush() -> str:
+            chunk = output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+            return chunk
+        
         # Header
         writer.writerow([
             "word", "word_type", "definition", "example_sentence",
             "meaning_source", "easiness_factor", "interval", "repetitions"
         ])
+        yield flush()
         
         # Data
         for vocab in vocabularies:
+            example = self._export_example(vocab)
             for meaning in vocab.meanings:
                 writer.writerow([
                     vocab.word,
                     vocab.word_type.value,
                     meaning.definition,
-                    "", # example_sentence legacy placeholder
+                    example,
                     meaning.meaning_source.value,
                     vocab.easiness_factor,
                     vocab.interval,
                     vocab.repetitions
                 ])
-        
-        return output.getvalue()
+            yield flush()
     
     def update_learning_status(
         self,
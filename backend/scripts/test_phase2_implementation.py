@@ -4,114 +4,166 @@ Kiểm tra:
 1. Vocabulary creation triggers background sentence generation
 2. Question generators use VocabularyContext correctly
 3. Migration data integrity
+
+Chạy trên database thật (settings.DATABASE_URL), tự động skip nếu không kết nối được:
+    pytest scripts/test_phase2_implementation.py -v -s -m ""
+    pytest scripts/test_phase2_implementation.py  # bỏ qua test slow (addopts trong pytest.ini)
 """
-import asyncio
 import sys
 import os
+from typing import TYPE_CHECKING
+
+import pytest
+
+# Import app.* lazily bên trong fixtures/tests để import module này không kéo theo toàn bộ app
+if TYPE_CHECKING:
+    from sqlmodel import Session
+    from app.models.vocabulary import Vocabulary
+
+
+@pytest.fixture(scope="session")
+def db():
+    """Session dùng chung cho toàn bộ module, skip nếu database không sẵn sàng."""
+    from sqlmodel import Session, create_engine
+    from sqlalchemy.exc import OperationalError
+    from app.core.config import settings
+
+    # Engine riêng theo settings.DATABASE_URL, không dùng engine đã bị tests/conftest.py override
+    engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+    try:
+        connection = engine.connect()
+    except OperationalError as e:
+        pytest.skip(f"Database không khả dụng: {e}")
+
+    # expire_on_commit=False: commit bên trong generate_and_save không buộc reload lại objects
+    with Session(bind=connection, expire_on_commit=False) as session:
+        yield session
+    connection.close()
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def function_word(db: "Session") -> "Vocabulary":
+    """Function word đầu tiên trong DB, load sẵn contexts một lần."""
+    from sqlmodel import select
+    from sqlalchemy.orm import selectinload
+    from app.models.vocabulary import Vocabulary
+    from app.models.enums import WordType
+
+    vocab = db.exec(
+        select(Vocabulary)
+        .where(Vocabulary.word_type == WordType.FUNCTION_WORD)
+        .options(selectinload(Vocabulary.contexts))
+        .limit(1)
+    ).first()
+    if vocab is None:
+        pytest.skip("Không có function word nào trong database")
+    return vocab
+
+
+def test_contexts_table_exists(db: "Session"):
+    """[TEST 1] Check migration - VocabularyContext table exists."""
+    from sqlmodel import select
+    from app.models.vocabulary_context import VocabularyContext
+
+    contexts = db.exec(select(VocabularyContext)).all()
+    print(f"✓ Found {len(contexts)} contexts in database")
+
+
+def test_meaning_schema(db: "Session"):
+    """[TEST 2] Check that VocabularyMeaning no longer has example_sentence."""
+    from sqlmodel import select
+    from app.models.vocabulary_meaning import VocabularyMeaning
+
+    meaning = db.exec(select(VocabularyMeaning).limit(1)).first()
+    if meaning is None:
+        pytest.skip("Không có meaning nào trong database")
+
+    assert not hasattr(meaning, "example_sentence"), "example_sentence field still exists!"
+    print("✓ example_sentence field removed successfully")
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_sentence_generator(db: "Session", function_word: "Vocabulary"):
+    """[TEST 3] Test SentenceGeneratorService (gọi AI provider thật)."""
+    from app.services.sentence_generator import SentenceGeneratorService
+
+    print(f"  Testing with vocab: '{function_word.word}'")
+
+    # Check if context already exists
+    if function_word.contexts:
+        print(f"  ✓ Vocab already has {len(function_word.contexts)} context(s)")
+        print(f"    Example: {function_word.contexts[0].sentence}")
+        return
+
+    print("  No context found, generating...")
+    service = SentenceGeneratorService(db)
+    context = await service.generate_and_save(function_word.id)
+    if context is None:
+        pytest.skip("Context generation skipped or failed")
+    print(f"  ✓ Generated context: {context.sentence}")
+
+
+def test_question_generator(db: "Session", function_word: "Vocabulary"):
+    """[TEST 4] Test Question Generator with VocabularyContext."""
+    from sqlmodel import select
+    from sqlalchemy.orm import selectinload
+    from app.models.vocabulary import Vocabulary
+    from app.services.question_generator.factory import QuestionGeneratorFactory
+    from app.models.enums import QuestionDifficulty
+
+    # Reload contexts: fixture dùng chung session (expire_on_commit=False) nên có thể còn giữ
+    # danh sách contexts cũ, không thấy context vừa được test_sentence_generator tạo
+    function_word = db.exec(
+        select(Vocabulary)
+        .where(Vocabulary.id == function_word.id)
+        .options(selectinload(Vocabulary.contexts))
+        .execution_options(populate_existing=True)
+    ).one()
+
+    print(f"  Testing with function word: '{function_word.word}'")
+    print(f"  Contexts available: {len(function_word.contexts)}")
+
+    strategy = QuestionGeneratorFactory.get_strategy(
+        function_word,
+        QuestionDifficulty.MEDIUM
+    )
+
+    question = strategy.generate(
+        function_word,
+        QuestionDifficulty.MEDIUM,
+        []
+    )
+
+    assert question["question_text"]
+    print(f"  ✓ Generated question type: {question['question_type']}")
+    print(f"    Question text: {question['question_text'][:80]}...")
+
+
+def test_migration_integrity(db: "Session"):
+    """[TEST 5] Check data migration integrity."""
+    from sqlmodel import select
+    from app.models.vocabulary_context import VocabularyContext
 
-# Add backend to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
-from sqlmodel import Session, select
-from app.db.session import engine
-from app.models.vocabulary import Vocabulary
-from app.models.vocabulary_context import VocabularyContext
-from app.models.vocabulary_meaning import VocabularyMeaning
-from app.services.sentence_generator import SentenceGeneratorService
-from app.services.question_generator.factory import QuestionGeneratorFactory
-from app.models.enums import QuestionDifficulty, WordType
-
-
-async def test_phase_2():
-    """Test toàn bộ Phase 2 flow."""
-    
-    print("=" * 60)
-    print("PHASE 2 VERIFICATION TEST")
-    print("=" * 60)
-    
-    with Session(engine) as db:
-        # Test 1: Check migration - VocabularyContext table exists
-        print("\n[TEST 1] Checking VocabularyContext table...")
-        contexts = db.exec(select(VocabularyContext)).all()
-        print(f"✓ Found {len(contexts)} contexts in database")
-        
-        # Test 2: Check that VocabularyMeaning no longer has example_sentence
-        print("\n[TEST 2] Checking VocabularyMeaning schema...")
-        meaning = db.exec(select(VocabularyMeaning).limit(1)).first()
-        if meaning:
-            # Try to access example_sentence (should fail)
-            try:
-                _ = meaning.example_sentence
-                print("✗ FAILED: example_sentence field still exists!")
-            except AttributeError:
-                print("✓ example_sentence field removed successfully")
-        
-        # Test 3: Test SentenceGeneratorService
-        print("\n[TEST 3] Testing SentenceGeneratorService...")
-        vocab = db.exec(
-            select(Vocabulary)
-            .where(Vocabulary.word_type == WordType.FUNCTION_WORD)
-            .limit(1)
-        ).first()
-        
-        if vocab:
-            print(f"  Testing with vocab: '{vocab.word}'")
-            service = SentenceGeneratorService(db)
-            
-            # Check if context already exists
-            if vocab.contexts:
-                print(f"  ✓ Vocab already has {len(vocab.contexts)} context(s)")
-                print(f"    Example: {vocab.contexts[0].sentence}")
-            else:
-                print("  No context found, generating...")
-                context = await service.generate_and_save(vocab.id)
-                if context:
-                    print(f"  ✓ Generated context: {context.sentence}")
-                else:
-                    print("  ⚠ Context generation skipped or failed")
-        
-        # Test 4: Test Question Generator with VocabularyContext
-        print("\n[TEST 4] Testing Question Generator...")
-        function_word = db.exec(
-            select(Vocabulary)
-            .where(Vocabulary.word_type == WordType.FUNCTION_WORD)
-            .limit(1)
-        ).first()
-        
-        if function_word:
-            db.refresh(function_word)  # Reload with contexts
-            print(f"  Testing with function word: '{function_word.word}'")
-            print(f"  Contexts available: {len(function_word.contexts)}")
-            
-            strategy = QuestionGeneratorFactory.get_strategy(
-                function_word,
-                QuestionDifficulty.MEDIUM
-            )
-            
-            question = strategy.generate(
-                function_word,
-                QuestionDifficulty.MEDIUM,
-                []
-            )
-            
-            print(f"  ✓ Generated question type: {question['question_type']}")
-            print(f"    Question text: {question['question_text'][:80]}...")
-        
-        # Test 5: Check data migration integrity
-        print("\n[TEST 5] Checking data migration integrity...")
-        migrated_contexts = db.exec(
-            select(VocabularyContext)
-            .where(VocabularyContext.ai_provider == "migrated")
-        ).all()
-        print(f"  ✓ Found {len(migrated_contexts)} migrated contexts")
-        if migrated_contexts:
-            sample = migrated_contexts[0]
-            print(f"    Sample: vocab_id={sample.vocabulary_id}, sentence='{sample.sentence[:50]}...'")
-    
-    print("\n" + "=" * 60)
-    print("PHASE 2 VERIFICATION COMPLETE")
-    print("=" * 60)
+    # Stream kết quả thay vì load toàn bộ vào RAM (DB production có thể rất lớn)
+    migrated_contexts = db.exec(
+        select(VocabularyContext)
+        .where(VocabularyContext.ai_provider == "migrated")
+        .execution_options(stream_results=True, yield_per=100)
+    )
+    sample = None
+    migrated_count = 0
+    for migrated_count, ctx in enumerate(migrated_contexts, 1):
+        if sample is None:
+            sample = ctx
+    print(f"  ✓ Found {migrated_count} migrated contexts")
+    if sample:
+        assert sample.sentence
+        print(f"    Sample: vocab_id={sample.vocabulary_id}, sentence='{sample.sentence[:50]}...'")
 
 
 if __name__ == "__main__":
-    asyncio.run(test_phase_2())
+    # Add backend to path
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    sys.exit(pytest.main([__file__, "-v", "-s"]))
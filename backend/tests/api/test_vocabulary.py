@@ -40,16 +40,15 @@ def test_create_vocabulary(auth_client: TestClient, session: Session):
     assert db_vocab.meanings[0].definition == "A greeting"
 
 
-def test_create_duplicate_vocabulary(auth_client: TestClient):
+def test_create_duplicate_vocabulary(auth_client: TestClient, vocab_factory):
     """Test không cho phép tạo từ vựng trùng lặp cho cùng một user."""
-    vocab_data = {
+    # Tạo sẵn trong DB
+    vocab_factory("World", defs=["The Earth"])
+    
+    response = auth_client.post("/api/v1/vocabulary/", json={
         "word": "World",
         "meanings": [{"definition": "The Earth"}]
-    }
-    # Tạo lần 1
-    auth_client.post("/api/v1/vocabulary/", json=vocab_data)
-    # Tạo lần 2
-    response = auth_client.post("/api/v1/vocabulary/", json=vocab_data)
+    })
     
     assert response.status_code == status.HTTP_400_BAD_REQUEST
     assert "đã tồn tại" in response.json()["detail"]
@@ -103,7 +102,7 @@ def test_update_vocabulary(auth_client: TestClient):
     assert response.json()["word_type"] == "function_word"
 
 
-def test_add_meaning(auth_client: TestClient):
+def test_add_meaning(auth_client: TestClient, session: Session):
     """Test thêm meaning cho từ vựng đã có."""
     create_res = auth_client.post("/api/v1/vocabulary/", json={
         "word": "Bank", 
@@ -117,9 +116,10 @@ def test_add_meaning(auth_client: TestClient):
     assert response.status_code == status.HTTP_201_CREATED
     assert response.json()["definition"] == "The land alongside a river"
     
-    # Check lại vocab
-    get_res = auth_client.get(f"/api/v1/vocabulary/{vocab_id}")
-    assert len(get_res.json()["meanings"]) == 2
+    # Kiểm tra database
+    statement = select(Vocabulary).where(Vocabulary.id == vocab_id).options(selectinload(Vocabulary.meanings))
+    db_vocab = session.exec(statement).one()
+    assert len(db_vocab.meanings) == 2
 
 
 def test_delete_vocabulary(auth_client: TestClient, session: Session):
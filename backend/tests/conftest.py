@@ -1,9 +1,10 @@
 """Test configuration và fixtures."""
 import pytest
-from typing import Generator
-from sqlmodel import Session, create_engine, SQLModel, select
-from sqlmodel.pool import StaticPool
-from fastapi.testclient import TestClient
+from contextlib import contextmanager, nullcontext
+from typing import TYPE_CHECKING, Callable, Generator, List, Optional
+from sqlmodel import Session, create_engine, SQLModel
+from sqlalchemy import bindparam, event
+from sqlalchemy.pool import NullPool
 
 # Mock environment variables BEFORE any application code is imported
 import os
@@ -13,94 +14,348 @@ os.environ["POSTGRES_DB"] = "test"
 os.environ["POSTGRES_HOST"] = "localhost"
 os.environ["SECRET_KEY"] = "test_secret_key"
 
-import app.db.session as db_session
-import app.db.init_db as db_init
-# We need to monkeypatch app.main.init_db specifically
-import app.main as app_main_module
+# app.main (FastAPI, routes) và models được import lazily trong hook/fixtures,
+# để các test thuần logic (srs_engine, ai utils, prompts) không phải trả chi phí import app
+if TYPE_CHECKING:
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.models.user import User
+    from app.models.vocabulary import Vocabulary
 
-# Import FastAPI instance with an alias to avoid shadowing package 'app'
-from app.main import app as fastapi_app
+# In-memory DB dạng shared-cache: mọi connection mở tới URI này dùng chung một database.
+# Mỗi xdist worker (pytest -n) có database riêng theo worker id
+TEST_DATABASE_URL = "sqlite:///file:memdb_{worker_id}?mode=memory&cache=shared&uri=true"
 
-# Import models at top level for typing
-from app.models.user import User
-from app.models.vocabulary import Vocabulary
-from app.models.review_history import ReviewHistory
-from app.models.ai_practice_log import AIPracticeLog
 
-# Tạo một shared engine cho testing (session-scoped)
-# Dùng StaticPool để in-memory DB tồn tại suốt vòng đời engine
-@pytest.fixture(scope="session")
-def engine():
+# Thứ tự/statement DELETE cho _module_cleanup, build một lần sau create_all
+_DELETE_STMTS: List = []
+
+
+def pytest_configure(config):
+    """
+    Tạo shared engine và tables một lần duy nhất cho mỗi worker.
+    Dùng NullPool để mỗi session/background task có connection riêng thay vì
+    tranh chấp một connection duy nhất như StaticPool.
+    """
+    # Đăng ký toàn bộ tables vào SQLModel.metadata (không kéo theo FastAPI)
+    import app.models  # noqa: F401
+    import app.db.session as db_session
+    
+    worker_id = getattr(config, "workerinput", {}).get("workerid", "gw0")
     engine = create_engine(
-        "sqlite:///:memory:",
+        TEST_DATABASE_URL.format(worker_id=worker_id),
         connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
+        poolclass=NullPool,
     )
     
-    # Khởi tạo tables một lần duy nhất cho toàn bộ session
+    # pysqlite tự quản lý transaction và bỏ qua SAVEPOINT đúng cách,
+    # tắt hành vi đó để SQLAlchemy tự phát BEGIN (cần cho rollback per-test)
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transaction(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    # Test DB không cần durability: bỏ journal/fsync trên mỗi connection.
+    # Không dùng locking_mode=EXCLUSIVE vì NullPool mở nhiều connection tới cùng DB
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=MEMORY")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+    
+    # Đánh dấu có ghi dữ liệu để _module_cleanup bỏ qua được các module không chạm DB.
+    # Bỏ qua connection per-test (session fixture): mọi thay đổi trên đó đều bị rollback
+    config._db_dirty = False
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _mark_dirty(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("rolled_back_per_test"):
+            return
+        if statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+            config._db_dirty = True
+    
+    # Giữ một connection mở suốt test session, nếu không in-memory DB
+    # sẽ bị xóa khi connection cuối cùng đóng lại
+    config._engine_keepalive = engine.connect()
     SQLModel.metadata.create_all(engine)
     
-    # Override global engine và init_db
+    # Xóa theo thứ tự ngược dependency, giữ lại user mẫu (seed data)
+    user_table = app.models.User.__table__
+    _DELETE_STMTS[:] = [
+        table.delete().where(table.c.id != bindparam("seed_user_id"))
+        if table is user_table else table.delete()
+        for table in reversed(SQLModel.metadata.sorted_tables)
+    ]
+    
+    # Override global engine
     db_session.engine = engine
-    db_init.init_db = lambda: None
-    app_main_module.init_db = lambda: None
     
-    return engine
+    config._engine = engine
 
 
-@pytest.fixture(name="session")
-def session_fixture(engine) -> Generator[Session, None, None]:
+def pytest_unconfigure(config):
+    engine = getattr(config, "_engine", None)
+    if engine is not None:
+        config._engine_keepalive.close()
+        engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def engine(request):
+    """Engine dùng chung, được tạo trong pytest_configure."""
+    return request.config._engine
+
+
+class FakeDictionaryService:
     """
-    Tạo database session cho testing.
-    Dọn dẹp data sau mỗi test.
+    DictionaryService giả, không gọi Google Translate.
+    Test gán `FakeDictionaryService.responses = {word: (definition, source)}`
+    và đọc `batch_calls`/`translate_calls` (thông qua fixture fake_dictionary để được reset sau mỗi test).
     """
-    with Session(engine) as session:
-        yield session
-        # Dọn dẹp dữ liệu để các test case độc lập
-        for table in reversed(SQLModel.metadata.sorted_tables):
-            session.execute(table.delete())
-        session.commit()
+    responses: dict = {}
+    batch_calls: list = []
+    translate_calls: list = []
 
+    def __init__(self, session=None):
+        self.session = session
 
-@pytest.fixture(name="client")
-def client_fixture(session: Session) -> Generator[TestClient, None, None]:
+    async def translate_text(self, text: str, source_lang: str = "en", target_lang: str = "vi") -> Optional[str]:
+        # Không dịch: caller giữ nguyên text gốc
+        self.translate_calls.append(text)
+        return None
+
+    async def get_definition(self, word: str) -> tuple:
+        return self.responses.get(word, (None, None))
+
+    async def batch_get_definitions(self, words: List[str]) -> dict:
+        self.batch_calls.append(list(words))
+        return {word: self.responses.get(word, (None, None)) for word in words}
+
+
+@contextmanager
+def _override_dependency(app: "FastAPI", dependency: Callable, override: Callable):
     """
-    Tạo test client với database session override.
+    Cài dependency override trong phạm vi block, khi thoát chỉ khôi phục key này
+    (giữ nguyên override cũ nếu có) thay vì clear() toàn bộ dependency_overrides.
     """
+    overrides = app.dependency_overrides
+    missing = object()
+    previous = overrides.get(dependency, missing)
+    overrides[dependency] = override
+    try:
+        yield
+    finally:
+        if previous is missing:
+            overrides.pop(dependency, None)
+        else:
+            overrides[dependency] = previous
+
+
+@contextmanager
+def _override_session(app: "FastAPI", session: Session):
+    """Cho get_db và get_session_factory (dùng bởi streaming endpoints) trả về session của test."""
+    from app.api.deps import get_db, get_session_factory
+
     def get_session_override():
         return session
+
+    def get_session_factory_override():
+        # nullcontext: `with session_factory()` của endpoint không đóng session của test
+        return lambda: nullcontext(session)
+
+    with _override_dependency(app, get_db, get_session_override), \
+            _override_dependency(app, get_session_factory, get_session_factory_override):
+        yield
+
+
+@pytest.fixture(name="fastapi_app", scope="session")
+def fastapi_app_fixture(engine) -> "FastAPI":
+    """Import FastAPI app lần đầu khi có test cần tới, bỏ qua init_db."""
+    import app.db.init_db as db_init
+    # We need to monkeypatch app.main.init_db specifically
+    import app.main as app_main_module
+    from app.api.deps import get_dictionary_service
     
-    from app.api.deps import get_db
-    fastapi_app.dependency_overrides[get_db] = get_session_override
-    
-    with TestClient(fastapi_app) as client:
-        yield client
-    
-    fastapi_app.dependency_overrides.clear()
+    db_init.init_db = lambda: None
+    app_main_module.init_db = lambda: None
+    # Không bao giờ gọi dịch thật trong test (override một lần cho cả session)
+    app_main_module.app.dependency_overrides[get_dictionary_service] = FakeDictionaryService
+    return app_main_module.app
+
 
+@pytest.fixture(name="fake_dictionary")
+def fake_dictionary_fixture() -> Generator[type, None, None]:
+    """FakeDictionaryService class để test cấu hình responses, reset sau mỗi test."""
+    FakeDictionaryService.batch_calls = []
+    FakeDictionaryService.translate_calls = []
+    yield FakeDictionaryService
+    FakeDictionaryService.responses = {}
+    FakeDictionaryService.batch_calls = []
+    FakeDictionaryService.translate_calls = []
+
+
+@pytest.fixture(name="_hashed_pw", scope="session")
+def _hashed_pw_fixture() -> str:
+    """Hash password bằng hasher thật một lần duy nhất (bcrypt chậm có chủ đích)."""
+    from app.core.security import get_password_hash
+    return get_password_hash("password123")
+
+
+@pytest.fixture(name="normal_user", scope="session")
+def normal_user_fixture(engine, _hashed_pw: str) -> "User":
+    """
+    Tạo một user mẫu trong database, một lần cho toàn bộ test session.
+    User được trả về ở trạng thái detached (đã load sẵn các cột).
+    """
+    from app.models.user import User
 
-@pytest.fixture(name="normal_user")
-def normal_user_fixture(session: Session) -> User:
-    """Tạo một user mẫu trong database."""
     user = User(
         email="test@example.com",
         username="testuser",
-        hashed_password="hashed_password",
+        hashed_password=_hashed_pw,
         is_active=True
     )
-    session.add(user)
-    session.commit()
-    session.refresh(user)
+    # Các default đều tính phía Python và PK được gán sau flush,
+    # nên không cần refresh (thêm một SELECT) sau commit
+    with Session(engine, expire_on_commit=False) as session:
+        session.add(user)
+        session.commit()
     return user
 
 
-@pytest.fixture(name="auth_client")
-def auth_client_fixture(client: TestClient, normal_user: User) -> TestClient:
-    """Tạo client đã được mock authenticate."""
+@pytest.fixture(scope="module")
+def _module_cleanup(request, engine, normal_user: "User") -> Generator[None, None, None]:
+    """
+    Dọn dữ liệu một lần sau mỗi module, cho các thay đổi đã commit ngoài
+    transaction per-test (vd: endpoint/background task mở Session(engine) riêng).
+    Giữ lại user mẫu (seed data). Bỏ qua nếu không có lệnh ghi nào kể từ lần dọn trước.
+    """
+    yield
+    config = request.config
+    if not config._db_dirty:
+        return
+    with engine.begin() as connection:
+        for statement in _DELETE_STMTS:
+            connection.execute(statement, {"seed_user_id": normal_user.id})
+    config._db_dirty = False
+
+
+@pytest.fixture(scope="session")
+def _warm_sa_cache(engine) -> None:
+    """
+    Chạy trước các câu SELECT của export (json và txt/csv) trên DB rỗng để SQLAlchemy
+    compile và cache statement một lần, test export đầu tiên không phải trả chi phí này.
+    """
+    from app.services.vocabulary_service import VocabularyService
+
+    with Session(engine) as session:
+        service = VocabularyService(session)
+        for format in ("json", "txt"):
+            service.export_vocabularies(user_id=0, format=format)
+
+
+@pytest.fixture(name="session")
+def session_fixture(
+    engine, normal_user: "User", _module_cleanup, _warm_sa_cache
+) -> Generator[Session, None, None]:
+    """
+    Tạo database session cho testing.
+    Mỗi test chạy trong một transaction ngoài và bị rollback khi kết thúc;
+    session.commit() bên trong test/app chỉ release SAVEPOINT.
+    """
+    connection = engine.connect()
+    # Không tính là dữ liệu bẩn cho _module_cleanup (NullPool: info mất theo connection khi close)
+    connection.info["rolled_back_per_test"] = True
+    transaction = connection.begin()
+    with Session(bind=connection, join_transaction_mode="create_savepoint") as session:
+        yield session
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(name="no_background_tasks")
+def no_background_tasks_fixture(monkeypatch) -> None:
+    """
+    Bỏ qua background tasks sau khi tạo vocabulary (câu ví dụ, audio, pre-generate questions).
+    TestClient chạy chúng ngay sau mỗi response; chúng mở Session(engine) riêng
+    và gọi AI provider/TTS thật, không thuộc phạm vi test API.
+    """
+    from app.services import tasks
+
+    async def _noop_task(vocab_id: int):
+        pass
+
+    for name in ("generate_example_sentence_task", "generate_audio_task", "pre_generate_questions_task"):
+        monkeypatch.setattr(tasks, name, _noop_task)
+
+
+@pytest.fixture(name="_client", scope="session")
+def _client_fixture(fastapi_app: "FastAPI") -> Generator["TestClient", None, None]:
+    """TestClient dùng chung cho toàn bộ session (startup/shutdown chỉ chạy một lần)."""
+    from fastapi.testclient import TestClient
+
+    with TestClient(fastapi_app) as client:
+        yield client
+
+
+@pytest.fixture(name="client")
+def client_fixture(
+    _client: "TestClient", fastapi_app: "FastAPI", session: Session, no_background_tasks
+) -> Generator["TestClient", None, None]:
+    """
+    Tạo test client với database session override.
+    """
+    with _override_session(fastapi_app, session):
+        yield _client
+
+
+@pytest.fixture(name="_auth_override", scope="session")
+def _auth_override_fixture(normal_user: "User") -> tuple:
+    """(dependency, override) cho get_current_user, build một lần cho cả session."""
     from app.api.deps import get_current_user
     def get_current_user_override():
         return normal_user
     
-    fastapi_app.dependency_overrides[get_current_user] = get_current_user_override
-    yield client
-    fastapi_app.dependency_overrides.pop(get_current_user, None)
+    return get_current_user, get_current_user_override
+
+
+@pytest.fixture(name="auth_client")
+def auth_client_fixture(
+    client: "TestClient", fastapi_app: "FastAPI", _auth_override: tuple
+) -> Generator["TestClient", None, None]:
+    """
+    Tạo client đã được mock authenticate.
+    TestClient, user và override đều dùng chung cả session; fixture này chỉ
+    bật override trong phạm vi test (app.dependency_overrides là global).
+    """
+    with _override_dependency(fastapi_app, *_auth_override):
+        yield client
+
+
+@pytest.fixture(name="vocab_factory")
+def vocab_factory_fixture(session: Session, normal_user: "User") -> Callable[..., "Vocabulary"]:
+    """
+    Factory tạo vocabulary trực tiếp trong database cho normal_user.
+    Dùng cho setup data thay vì đi qua API.
+    """
+    from app.models.vocabulary import Vocabulary
+    from app.models.vocabulary_meaning import VocabularyMeaning
+    from app.services.vocabulary_service import VocabularyService
+
+    def _create(word: str, defs: Optional[List[str]] = None, **kwargs) -> Vocabulary:
+        vocab = Vocabulary(
+            user_id=normal_user.id,
+            word=VocabularyService.normalize_word(word),
+            **kwargs
+        )
+        vocab.meanings = [VocabularyMeaning(definition=d) for d in defs or []]
+        session.add(vocab)
+        session.commit()
+        return vocab
+
+    return _create
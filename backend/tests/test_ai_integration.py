@@ -1,6 +1,7 @@
 """Tests cho AI Practice và Quiz Session Integration."""
 import pytest
-from unittest.mock import AsyncMock, patch
+from typing import Optional
+from unittest.mock import AsyncMock
 from fastapi import status
 from fastapi.testclient import TestClient
 
@@ -8,8 +9,61 @@ from app.ai.schemas import AIQuestion
 from app.models.enums import PracticeType
 
 
+@pytest.fixture(scope="session")
+def ai_q_dict() -> dict:
+    """Dữ liệu AIQuestion mẫu, validate và dump một lần cho cả test session."""
+    return AIQuestion(
+        question_text="What does AI stand for?",
+        options={"A": "Apple", "B": "Artificial Intelligence", "C": "Action"},
+        correct_answer="B",
+        explanation="AI is the simulation of human intelligence.",
+        practice_type=PracticeType.MULTIPLE_CHOICE
+    ).model_dump()
+
+
+@pytest.fixture(scope="module")
+def mock_ai_question(ai_q_dict: dict) -> AIQuestion:
+    """AIQuestion mẫu dựng từ dict đã validate (không validate lại)."""
+    return AIQuestion.model_construct(**ai_q_dict)
+
+
+def make_provider(question: AIQuestion, provider: Optional[AsyncMock] = None) -> AsyncMock:
+    """Cấu hình provider (mặc định AsyncMock mới) trả về question cho mọi generate_question."""
+    provider = provider or AsyncMock()
+    provider.generate_question.return_value = question
+    return provider
+
+
+@pytest.fixture(scope="session")
+def shared_ai_provider() -> AsyncMock:
+    """AsyncMock provider dùng chung, chỉ build một lần cho cả test session."""
+    return AsyncMock()
+
+
+@pytest.fixture(autouse=True)
+def _reset_shared_ai_provider(shared_ai_provider: AsyncMock):
+    """Xóa call history/return value để các test không ảnh hưởng lẫn nhau."""
+    yield
+    shared_ai_provider.reset_mock(return_value=True, side_effect=True)
+
+
+@pytest.fixture
+def patched_ai_provider(
+    monkeypatch, shared_ai_provider: AsyncMock, mock_ai_question: AIQuestion
+) -> AsyncMock:
+    """Thay get_ai_provider bằng provider dùng chung trả về mock_ai_question."""
+    make_provider(mock_ai_question, shared_ai_provider)
+    monkeypatch.setattr(
+        "app.services.vocabulary_service.get_ai_provider",
+        lambda *args, **kwargs: shared_ai_provider
+    )
+    return shared_ai_provider
+
+
 @pytest.mark.asyncio
-async def test_generate_quiz_session_with_mock_ai(auth_client: TestClient, session):
+async def test_generate_quiz_session_with_mock_ai(
+    auth_client: TestClient, session, patched_ai_provider, ai_q_dict: dict
+):
     """Test tạo phiền quiz với AI provider được mock."""
     # 1. Chuẩn bị data: Từ vựng DUE (next_review_date <= now)
     # create_vocabulary endpoint mặc định đặt next_review_date = now (DUE)
@@ -18,29 +72,16 @@ async def test_generate_quiz_session_with_mock_ai(auth_client: TestClient, sessi
         "meanings": [{"definition": "Artificial Intelligence"}]
     })
     
-    # 2. Mock AI Provider
-    mock_ai_question = AIQuestion(
-        question_text="What does AI stand for?",
-        options={"A": "Apple", "B": "Artificial Intelligence", "C": "Action"},
-        correct_answer="B",
-        explanation="AI is the simulation of human intelligence.",
-        practice_type=PracticeType.MULTIPLE_CHOICE
-    )
+    # 2. Gọi endpoint
+    response = auth_client.get("/api/v1/vocabulary/quiz-session?limit=5")
     
-    with patch("app.services.vocabulary_service.get_ai_provider") as mock_get_provider:
-        mock_provider = AsyncMock()
-        mock_provider.generate_question.return_value = mock_ai_question
-        mock_get_provider.return_value = mock_provider
-        
-        # 3. Gọi endpoint
-        response = auth_client.get("/api/v1/vocabulary/quiz-session?limit=5")
-        
-        assert response.status_code == status.HTTP_200_OK
-        data = response.json()
-        assert "questions" in data
-        assert len(data["questions"]) > 0
-        assert data["questions"][0]["word"] == "ai"
-        assert data["questions"][0]["question_text"] == "What does AI stand for?"
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert "questions" in data
+    assert len(data["questions"]) > 0
+    first = data["questions"][0]
+    expected = {"word": "ai", "question_text": ai_q_dict["question_text"]}
+    assert first | expected == first
 
 
 def test_generate_quiz_session_no_due_words(auth_client: TestClient, session):
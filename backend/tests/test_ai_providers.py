@@ -1,5 +1,6 @@
 import pytest
-from unittest.mock import MagicMock, patch, AsyncMock
+from types import SimpleNamespace
+from unittest.mock import MagicMock
 from app.ai.factory import AIFactory
 from app.ai.openai_provider import OpenAIProvider
 from app.models.enums import AIProviderName, PracticeType
@@ -14,27 +15,42 @@ def test_ai_factory_invalid_provider():
     with pytest.raises(ValueError):
         AIFactory.get_provider("invalid_provider")
 
+_FAKE_RESPONSE = SimpleNamespace(
+    choices=[
+        SimpleNamespace(
+            message=SimpleNamespace(
+                content='{"question_text": "What is a test?", "correct_answer": "a trial", "practice_type": "multiple_choice"}'
+            )
+        )
+    ]
+)
+
+
+class _FakeCompletions:
+    async def create(self, *args, **kwargs):
+        return _FAKE_RESPONSE
+
+
+class _FakeClient:
+    """Thay thế AsyncOpenAI, trả về response dựng sẵn thay vì gọi API."""
+    def __init__(self, *args, **kwargs):
+        self.chat = SimpleNamespace(completions=_FakeCompletions())
+
+
+@pytest.fixture(scope="module", autouse=True)
+def fake_openai_client():
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("app.ai.openai_provider.AsyncOpenAI", _FakeClient)
+        yield
+
 @pytest.mark.asyncio
 async def test_openai_provider_generate_question():
     mock_vocab = MagicMock(spec=Vocabulary)
     mock_vocab.word = "test"
     mock_vocab.definition = "a trial"
     
-    with patch("app.ai.openai_provider.AsyncOpenAI") as MockClient:
-        mock_instance = MockClient.return_value
-        # Sử dụng AsyncMock cho async method
-        mock_instance.chat.completions.create = AsyncMock(return_value=MagicMock(
-            choices=[
-                MagicMock(
-                    message=MagicMock(
-                        content='{"question_text": "What is a test?", "correct_answer": "a trial", "practice_type": "multiple_choice"}'
-                    )
-                )
-            ]
-        ))
-        
-        provider = OpenAIProvider(api_key="fake")
-        question = await provider.generate_question(mock_vocab, PracticeType.MULTIPLE_CHOICE)
-        
-        assert isinstance(question, AIQuestion)
-        assert question.question_text == "What is a test?"
+    provider = OpenAIProvider(api_key="fake")
+    question = await provider.generate_question(mock_vocab, PracticeType.MULTIPLE_CHOICE)
+    
+    assert isinstance(question, AIQuestion)
+    assert question.question_text == "What is a test?"
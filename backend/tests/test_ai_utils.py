@@ -1,29 +1,31 @@
 import pytest
 from app.ai.utils import strip_reasoning
 
-def test_strip_reasoning_basic():
-    text = "Hello world <think>I should say hello</think> how are you?"
-    expected = "Hello world  how are you?"
-    assert strip_reasoning(text) == expected.strip()
-
-def test_strip_reasoning_multiline():
-    text = "Line 1\n<think>\nReasoning line 1\nReasoning line 2\n</think>\nLine 2"
-    expected = "Line 1\n\nLine 2"
-    assert strip_reasoning(text) == expected.strip()
-
-def test_strip_reasoning_multiple():
-    text = "<think>R1</think>Part 1<think>R2</think>Part 2"
-    expected = "Part 1Part 2"
-    assert strip_reasoning(text) == expected.strip()
-
-def test_strip_reasoning_unclosed():
+# (text, expected) - dựng một lần khi import module
+STRIP_REASONING_CASES = [
+    pytest.param(
+        "Hello world <think>I should say hello</think> how are you?",
+        "Hello world  how are you?",
+        id="basic",
+    ),
+    pytest.param(
+        "Line 1\n<think>\nReasoning line 1\nReasoning line 2\n</think>\nLine 2",
+        "Line 1\n\nLine 2",
+        id="multiline",
+    ),
+    pytest.param(
+        "<think>R1</think>Part 1<think>R2</think>Part 2",
+        "Part 1Part 2",
+        id="multiple",
+    ),
     # Bây giờ strip_reasoning xử lý được cả thẻ không đóng
     # Nó sẽ loại bỏ tất cả nội dung từ <think> đến cuối chuỗi
-    text = "Hello <think> reasoning..."
-    expected = "Hello"
-    assert strip_reasoning(text) == expected.strip()
+    pytest.param("Hello <think> reasoning...", "Hello", id="unclosed"),
+    pytest.param(None, "", id="none"),
+    pytest.param("", "", id="empty"),
+    pytest.param("   ", "", id="whitespace"),
+]
 
-def test_strip_reasoning_none_empty():
-    assert strip_reasoning(None) == ""
-    assert strip_reasoning("") == ""
-    assert strip_reasoning("   ") == ""
+@pytest.mark.parametrize("text,expected", STRIP_REASONING_CASES)
+def test_strip_reasoning(text, expected):
+    assert strip_reasoning(text) == expected.strip()
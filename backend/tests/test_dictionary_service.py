@@ -0,0 +1,44 @@
+"""Tests cho DictionaryService (không gọi Google Translate thật)."""
+import threading
+import time
+
+import pytest
+
+from app.models.enums import MeaningSource
+from app.services.dictionary_service import DictionaryService
+
+
+class _SlowTranslator:
+    """GoogleTranslator giả: chậm một chút và ghi lại số request chạy đồng thời."""
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+
+    def __init__(self, source: str, target: str):
+        pass
+
+    def translate(self, text: str) -> str:
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        time.sleep(0.01)
+        with cls.lock:
+            cls.active -= 1
+        return f"vi:{text}"
+
+
+@pytest.mark.asyncio
+async def test_batch_get_definitions_caps_concurrency(monkeypatch):
+    """Batch lớn không gửi quá MAX_CONCURRENT_REQUESTS request cùng lúc."""
+    import deep_translator
+
+    monkeypatch.setattr(deep_translator, "GoogleTranslator", _SlowTranslator)
+    monkeypatch.setattr(_SlowTranslator, "max_active", 0)
+    words = [f"word{i}" for i in range(40)] + ["word0"]
+
+    results = await DictionaryService(session=None).batch_get_definitions(words)
+
+    assert len(results) == 40
+    assert results["word0"] == ("vi:word0", MeaningSource.AUTO_TRANSLATE)
+    assert 1 <= _SlowTranslator.max_active <= DictionaryService.MAX_CONCURRENT_REQUESTS
@@ -1,27 +1,23 @@
 from app.ai import prompts
 from app.models.enums import PracticeType
 
-def test_prompt_formatting():
-    # Test Multiple Choice
-    p1 = prompts.MULTIPLE_CHOICE_GEN.format(word="apple", definition="a fruit")
-    assert "apple" in p1
-    assert "a fruit" in p1
-    
-    # Test Fill Blank
-    p2 = prompts.FILL_BLANK_GEN.format(word="banana", definition="long yellow fruit")
-    assert "banana" in p2
-    assert "long yellow fruit" in p2
-
-    # Test Grammar Eval
-    p3 = prompts.GRAMMAR_EVAL.format(question="Q", expected="E", answer="A")
-    assert "Q" in p3
-    assert "E" in p3
-    assert "A" in p3
+# (template, values) - các giá trị cũng là token phải xuất hiện trong prompt đã render
+_PROMPT_CASES = [
+    # Multiple Choice
+    (prompts.MULTIPLE_CHOICE_GEN, {"word": "apple", "definition": "a fruit"}),
+    # Fill Blank
+    (prompts.FILL_BLANK_GEN, {"word": "banana", "definition": "long yellow fruit"}),
+    # Grammar Eval
+    (prompts.GRAMMAR_EVAL, {"question": "Q", "expected": "E", "answer": "A"}),
+    # Explanation
+    (prompts.VOCAB_EXPLANATION, {"word": "cherry", "definition": "small red fruit"}),
+]
 
-    # Test Explanation
-    p4 = prompts.VOCAB_EXPLANATION.format(word="cherry", definition="small red fruit")
-    assert "cherry" in p4
-    assert "small red fruit" in p4
+def test_prompt_formatting():
+    for template, values in _PROMPT_CASES:
+        rendered = template.format_map(values)
+        tokens = frozenset(values.values())
+        assert all(token in rendered for token in tokens), rendered
 
 if __name__ == "__main__":
     test_prompt_formatting()
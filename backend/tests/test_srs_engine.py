@@ -18,75 +18,78 @@ from app.core.srs_engine import (
     simulate_review_sequence
 )
 
+# Thời điểm cố định thay cho datetime.utcnow() trong các test phụ thuộc "now"
+_FIXED = datetime(2026, 2, 5, 12, 0, 0)
+
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def utcnow(cls):
+        return _FIXED
+
+
+def _is_non_decreasing(values):
+    """So sánh từng cặp liền kề, O(n) thay vì sort lại cả list."""
+    return all(a <= b for a, b in zip(values, values[1:]))
+
+
+@pytest.fixture
+def frozen_now(monkeypatch):
+    """Đóng băng datetime.utcnow() trong app.core.srs_engine."""
+    monkeypatch.setattr("app.core.srs_engine.datetime", _FrozenDatetime)
+    return _FIXED
+
 
 class TestSRSState:
     """Test SRSState dataclass."""
     
-    def test_default_initialization(self):
-        """Test khởi tạo với defaults."""
-        state = SRSState()
-        
-        assert state.easiness_factor == 2.5
-        assert state.interval == 0
-        assert state.repetitions == 0
-        assert state.next_review_date is not None
-        assert state.last_review_date is None
-    
-    def test_custom_initialization(self):
-        """Test khởi tạo với custom values."""
-        review_date = datetime(2026, 2, 5, 12, 0, 0)
-        state = SRSState(
-            easiness_factor=2.0,
-            interval=5,
-            repetitions=3,
-            next_review_date=review_date
-        )
-        
-        assert state.easiness_factor == 2.0
-        assert state.interval == 5
-        assert state.repetitions == 3
-        assert state.next_review_date == review_date
-    
-    def test_easiness_factor_clamping_min(self):
-        """Test EF bị clamp về minimum 1.3."""
-        state = SRSState(easiness_factor=1.0)
-        assert state.easiness_factor == 1.3
-    
-    def test_easiness_factor_clamping_max(self):
-        """Test EF bị clamp về maximum 2.5."""
-        state = SRSState(easiness_factor=3.0)
-        assert state.easiness_factor == 2.5
+    @pytest.mark.parametrize(
+        "kwargs, attr, expected",
+        [
+            # Defaults
+            ({}, "easiness_factor", 2.5),
+            ({}, "interval", 0),
+            ({}, "repetitions", 0),
+            ({}, "next_review_date", _FIXED),
+            ({}, "last_review_date", None),
+            # Custom values
+            ({"easiness_factor": 2.0}, "easiness_factor", 2.0),
+            ({"interval": 5}, "interval", 5),
+            ({"repetitions": 3}, "repetitions", 3),
+            ({"next_review_date": datetime(2026, 2, 10, 12, 0, 0)},
+             "next_review_date", datetime(2026, 2, 10, 12, 0, 0)),
+            # EF bị clamp về [1.3, 2.5]
+            ({"easiness_factor": 1.0}, "easiness_factor", 1.3),
+            ({"easiness_factor": 3.0}, "easiness_factor", 2.5),
+        ],
+    )
+    def test_initialization(self, frozen_now, kwargs, attr, expected):
+        """Test khởi tạo SRSState (defaults, custom values, clamping)."""
+        state = SRSState(**kwargs)
+        assert getattr(state, attr) == expected
 
 
 class TestCalculateMemoryStrength:
     """Test calculate_memory_strength function."""
     
-    def test_zero_repetitions(self):
-        """Test với repetitions = 0 (chưa học)."""
+    @pytest.mark.parametrize(
+        "repetitions, interval, in_range",
+        [
+            (0, 0, lambda s: s == 0.0),             # chưa học
+            (1, 1, lambda s: 0.0 < s < 0.1),        # sau first review
+            (5, 30, lambda s: 0.3 < s < 0.6),       # sau nhiều reviews
+            (100, 1000, lambda s: s <= 1.0),        # không vượt quá 1.0
+        ],
+        ids=["zero_repetitions", "first_review", "multiple_reviews", "capped_at_one"]
+    )
+    def test_strength_range(self, repetitions, interval, in_range):
+        """Test strength nằm trong khoảng mong đợi (giữ nguyên biên strict/inclusive của từng case)."""
         strength = SRSEngine.calculate_memory_strength(
             easiness_factor=2.5,
-            repetitions=0,
-            interval=0
-        )
-        assert strength == 0.0
-    
-    def test_first_review(self):
-        """Test sau first review."""
-        strength = SRSEngine.calculate_memory_strength(
-            easiness_factor=2.5,
-            repetitions=1,
-            interval=1
+            repetitions=repetitions,
+            interval=interval
         )
-        assert 0.0 < strength < 0.1
-    
-    def test_multiple_reviews(self):
-        """Test sau nhiều reviews."""
-        strength = SRSEngine.calculate_memory_strength(
-            easiness_factor=2.5,
-            repetitions=5,
-            interval=30
-        )
-        assert 0.3 < strength < 0.6
+        assert in_range(strength), strength
     
     def test_strength_increases_with_repetitions(self):
         """Test strength tăng theo repetitions."""
@@ -95,15 +98,6 @@ class TestCalculateMemoryStrength:
         strength3 = SRSEngine.calculate_memory_strength(2.5, 10, 10)
         
         assert strength1 < strength2 < strength3
-    
-    def test_strength_capped_at_one(self):
-        """Test strength không vượt quá 1.0."""
-        strength = SRSEngine.calculate_memory_strength(
-            easiness_factor=2.5,
-            repetitions=100,
-            interval=1000
-        )
-        assert strength <= 1.0
 
 
 class TestCalculateNextReview:
@@ -328,20 +322,19 @@ class TestUpdateAfterReview:
 class TestIsDueForReview:
     """Test is_due_for_review function."""
     
-    def test_past_date_is_due(self):
+    def test_past_date_is_due(self, frozen_now):
         """Test với past date."""
-        past_date = datetime.utcnow() - timedelta(days=1)
+        past_date = frozen_now - timedelta(days=1)
         assert SRSEngine.is_due_for_review(past_date) is True
     
-    def test_future_date_not_due(self):
+    def test_future_date_not_due(self, frozen_now):
         """Test với future date."""
-        future_date = datetime.utcnow() + timedelta(days=1)
+        future_date = frozen_now + timedelta(days=1)
         assert SRSEngine.is_due_for_review(future_date) is False
     
-    def test_current_time_is_due(self):
+    def test_current_time_is_due(self, frozen_now):
         """Test với current time."""
-        current_time = datetime.utcnow()
-        assert SRSEngine.is_due_for_review(current_time, current_time) is True
+        assert SRSEngine.is_due_for_review(frozen_now, frozen_now) is True
 
 
 class TestGetRetentionRate:
@@ -422,7 +415,7 @@ class TestReviewSequenceScenarios:
         
         # Should have increasing intervals
         intervals = [s.interval for s in states]
-        assert intervals == sorted(intervals)
+        assert _is_non_decreasing(intervals)
         
         # EF sẽ giảm dần theo SM-2 (EASY q=3 vẫn làm giảm EF ~0.14 mỗi lần)
         # Nhưng vẫn trong valid range và cao hơn nếu dùng GOOD
@@ -561,14 +554,14 @@ class TestSRSEdgeCases:
         assert state.easiness_factor > 1.3
         assert state.easiness_factor <= 2.5
 
-    def test_very_large_interval(self):
+    def test_very_large_interval(self, frozen_now):
         """Test xử lý với interval cực lớn (phòng trường hợp overflow hoặc lỗi ngày tháng)."""
         state = SRSState(easiness_factor=2.5, interval=365*10, repetitions=50) # 10 năm
         
         new_state = SRSEngine.update_after_review(state, ReviewQuality.GOOD)
         
         assert new_state.interval > state.interval
-        assert (new_state.next_review_date - datetime.utcnow()).days > 3650
+        assert (new_state.next_review_date - frozen_now).days > 3650
 
     def test_minimum_ef_clamping(self):
         """Xác minh EF không bao giờ thấp hơn 1.3 kể cả khi liên tục FAIL."""
@@ -1,33 +1,54 @@
 """Tests cho các tính năng quản lý từ vựng mới: Import/Export, Word Classification."""
+import itertools
+import json
+import time
+import timeit
 import pytest
+from contextlib import contextmanager
+from datetime import datetime
 from fastapi import status
 from fastapi.testclient import TestClient
 from sqlmodel import Session, select
+from sqlalchemy import event
 from sqlalchemy.orm import selectinload
-from unittest.mock import AsyncMock, patch
 
 from app.models.vocabulary import Vocabulary
+from app.models.vocabulary_meaning import VocabularyMeaning
+from app.models.vocabulary_context import VocabularyContext
 from app.models.enums import WordType, MeaningSource
+from app.services.classification import FUNCTION_WORDS, classify_word, normalize_word
+
+
+def _fetch_vocabs(session: Session, vocab_ids: list) -> dict:
+    """Load các vocabulary (kèm meanings) theo id trong một query, trả về dict theo word."""
+    vocabs = session.exec(
+        select(Vocabulary)
+        .where(Vocabulary.id.in_(vocab_ids))
+        .options(selectinload(Vocabulary.meanings))
+    ).all()
+    return {v.word: v for v in vocabs}
 
 
 def test_word_classification_logic(auth_client: TestClient, session: Session):
     """Test từ vựng được phân loại đúng (Function vs Content)."""
-    # 1. Test Content Word
-    res1 = auth_client.post("/api/v1/vocabulary/", json={
-        "word": "Stunning", 
-        "meanings": [{"definition": "Very beautiful"}]
+    # 1 + 2. Content Word và Function Word qua một lần import
+    res = auth_client.post("/api/v1/vocabulary/import", json={
+        "content": "Stunning|Very beautiful\nAlthough|In spite of the fact that",
+        "auto_fetch_meaning": False
     })
-    assert res1.json()["word_type"] == "content_word"
-    assert res1.json()["is_word_type_manual"] is False
+    assert res.status_code == status.HTTP_200_OK
+    assert res.json()["new_words"] == 2
     
-    # 2. Test Function Word
-    res2 = auth_client.post("/api/v1/vocabulary/", json={
-        "word": "Although", 
-        "meanings": [{"definition": "In spite of the fact that"}]
-    })
-    assert res2.json()["word_type"] == "function_word"
+    vocabs = {
+        v.word: v for v in session.exec(
+            select(Vocabulary).where(Vocabulary.word.in_(["stunning", "although"]))
+        ).all()
+    }
+    assert vocabs["stunning"].word_type == WordType.CONTENT_WORD
+    assert vocabs["stunning"].is_word_type_manual is False
+    assert vocabs["although"].word_type == WordType.FUNCTION_WORD
     
-    # 3. Test Manual Override
+    # 3. Test Manual Override (import chưa hỗ trợ word_type theo từng dòng)
     res3 = auth_client.post("/api/v1/vocabulary/", json={
         "word": "In", 
         "meanings": [{"definition": "Inside"}],
@@ -37,78 +58,374 @@ def test_word_classification_logic(auth_client: TestClient, session: Session):
     assert res3.json()["is_word_type_manual"] is True
 
 
-@pytest.mark.asyncio
-async def test_import_from_txt_basic(auth_client: TestClient, session: Session):
+def test_auth_client_reuses_session_client(auth_client: TestClient, _client: TestClient):
+    """auth_client chỉ bật override, dùng lại TestClient (và transport) chung của session."""
+    assert auth_client is _client
+
+
+def test_function_words_frozen_lookup():
+    """FUNCTION_WORDS là frozenset đã normalize, classify chỉ là một phép hash lookup."""
+    assert isinstance(FUNCTION_WORDS, frozenset)
+    assert all(word == normalize_word(word) for word in FUNCTION_WORDS)
+    assert classify_word("  Although ") == WordType.FUNCTION_WORD
+    assert classify_word("Stunning") == WordType.CONTENT_WORD
+
+
+@pytest.mark.slow
+def test_classifier_uncached_benchmark():
+    """100k lần phân loại không qua cache (normalize + frozenset lookup) dưới 100ms."""
+    words = sorted(FUNCTION_WORDS) + ["Stunning", "  Although ", "beautiful", "IN"]
+    batch = list(itertools.islice(itertools.cycle(words), 100_000))
+    classify = classify_word.__wrapped__
+    
+    # Lấy min của vài lần chạy để giảm nhiễu từ máy CI
+    elapsed = min(timeit.repeat(lambda: [classify(w) for w in batch], number=1, repeat=3))
+    assert elapsed < 0.1, f"100k lần classify mất {elapsed * 1000:.0f}ms"
+
+
+def test_classifier_cached():
+    """classify_word là hàm thuần được cache theo từ."""
+    classify_word.cache_clear()
+    for _ in range(1000):
+        assert classify_word("Stunning") == WordType.CONTENT_WORD
+    assert classify_word.cache_info().hits >= 999
+
+
+def test_import_from_txt_basic(auth_client: TestClient, session: Session):
     """Test import cơ bản từ file TXT."""
     content = "apple|quả táo|I eat an apple\nbanana|quả chuối"
     
-    # Mock DictionaryService để không gọi API thật
-    with patch("app.services.vocabulary_service.DictionaryService") as mock_service_class:
+    # DictionaryService đã được thay bằng FakeDictionaryService (conftest), không gọi API thật
+    response = auth_client.post("/api/v1/vocabulary/import", json={
+        "content": content,
+        "auto_fetch_meaning": False
+    })
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["total_processed"] == 2
+    assert data["new_words"] == 2
+    assert len(data["created_vocab_ids"]) == 2
+    
+    # Kiểm tra DB
+    vocab = _fetch_vocabs(session, data["created_vocab_ids"]).get("apple")
+    assert vocab is not None
+    # Cột example (thứ 3) không được import; VocabularyMeaning không còn example_sentence
+    assert [m.definition for m in vocab.meanings] == ["quả táo"]
+
+
+def test_import_with_auto_meaning(auth_client: TestClient, session: Session, fake_dictionary):
+    """Test import có tự động fetch nghĩa khi thiếu (một batch cho mọi từ thiếu nghĩa)."""
+    content = "strawberry\nblueberry\nkiwi|quả kiwi\ngreen kiwi|quả kiwi"
+    fake_dictionary.responses = {
+        "strawberry": ("A red fruit", MeaningSource.DICTIONARY_API)
+    }
+    
+    response = auth_client.post("/api/v1/vocabulary/import", json={
+        "content": content,
+        "auto_fetch_meaning": True
+    })
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["auto_generated_count"] == 1
+    assert data["failed_auto_meaning"] == ["blueberry"]
+    assert fake_dictionary.batch_calls == [["strawberry", "blueberry"]]
+    # Definition trùng nhau chỉ dịch một lần
+    assert fake_dictionary.translate_calls == ["quả kiwi"]
+    
+    # Kiểm tra DB
+    vocab = _fetch_vocabs(session, data["created_vocab_ids"])["strawberry"]
+    assert vocab.meanings[0].definition == "A red fruit"
+    assert vocab.meanings[0].meaning_source == "dictionary_api"
+
+
+@contextmanager
+def count_queries(conn):
+    """Ghi lại các câu SQL chạy trên connection trong phạm vi block."""
+    queries = []
+    
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        queries.append(statement)
+    
+    event.listen(conn, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(conn, "before_cursor_execute", _before_cursor_execute)
+
+
+def _bulk_seed(session: Session, user_id: int, definitions: dict) -> list:
+    """
+    Bulk insert vocabularies (mỗi từ một meaning), trả về list id theo thứ tự.
+    Bulk insert không áp dụng default phía Python nên phải điền đủ các cột NOT NULL.
+    """
+    now = datetime.utcnow()
+    vocab_rows = [
+        {
+            "user_id": user_id, "word": word,
+            "word_type": WordType.CONTENT_WORD, "is_word_type_manual": False,
+            "easiness_factor": 2.5, "interval": 0, "repetitions": 0,
+            "next_review_date": now, "created_at": now, "updated_at": now,
+        }
+        for word in definitions
+    ]
+    # return_defaults=True để lấy id vừa insert cho bảng meanings
+    session.bulk_insert_mappings(Vocabulary, vocab_rows, return_defaults=True)
+    session.bulk_insert_mappings(VocabularyMeaning, [
+        {"vocabulary_id": row["id"], "definition": definition,
+         "meaning_source": MeaningSource.MANUAL, "is_auto_generated": False,
+         "created_at": now, "updated_at": now}
+        for row, definition in zip(vocab_rows, definitions.values())
+    ])
+    return [row["id"] for row in vocab_rows]
+
+
+@pytest.fixture
+def seeded_vocab(session: Session, normal_user) -> list:
+    """Seed sẵn corpus cho export tests bằng bulk insert (bỏ qua API/validation/flush từng row)."""
+    vocab_ids = _bulk_seed(session, normal_user.id, {"export1": "def1", "export2": "def2"})
+    session.bulk_insert_mappings(VocabularyContext, [
+        {"vocabulary_id": vocab_ids[1], "sentence": "ex2", "ai_provider": "import",
+         "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()}
+    ])
+    session.commit()
+    return vocab_ids
+
+
+def test_export_vocabularies_json(auth_client: TestClient, seeded_vocab):
+    """Test export danh sách từ vựng sang JSON."""
+    response = auth_client.get("/api/v1/vocabulary/export?format=json")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/json")
+    
+    # JSON array được stream mỗi vocabulary một dòng
+    lines = list(response.iter_lines())
+    assert lines[0] == "[" and lines[-1] == "]"
+    items = [json.loads(line.rstrip(",")) for line in lines[1:-1]]
+    assert any(item["word"] == "export1" for item in items)
+
+
+def test_export_vocabularies_txt(auth_client: TestClient, seeded_vocab):
+    """Test export sang format TXT."""
+    response = auth_client.get("/api/v1/vocabulary/export?format=txt")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "export2|def2|ex2" in "".join(response.iter_text())
+
+
+def test_export_txt_example_sanitized(auth_client: TestClient, session: Session, normal_user):
+    """TXT export lấy context có id nhỏ nhất và bỏ '|'/xuống dòng trong câu ví dụ."""
+    vocab_id = _bulk_seed(session, normal_user.id, {"pipe": "a | b"})[0]
+    now = datetime.utcnow()
+    session.bulk_insert_mappings(VocabularyContext, [
+        {"vocabulary_id": vocab_id, "sentence": sentence, "ai_provider": "import",
+         "created_at": now, "updated_at": now}
+        for sentence in ("first|pipe\nsentence", "second sentence")
+    ])
+    session.commit()
+    
+    response = auth_client.get("/api/v1/vocabulary/export?format=txt")
+    assert response.status_code == status.HTTP_200_OK
+    assert "pipe|a b|first pipe sentence\n" in response.text
+
+
+def test_export_query_count(auth_client: TestClient, session: Session, normal_user):
+    """Export không bị N+1: số query không tăng theo số từ vựng."""
+    _bulk_seed(session, normal_user.id, {f"bulk{i}": f"def{i}" for i in range(50)})
+    session.commit()
+    
+    with count_queries(session.connection()) as queries:
+        response = auth_client.get("/api/v1/vocabulary/export?format=json")
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 50
+    assert len(queries) <= 3, queries
+
+
+@pytest.mark.parametrize("format", ["json", "txt", "csv"])
+def test_export_no_lazy_loads(auth_client: TestClient, session: Session, seeded_vocab, format):
+    """Export query dùng raiseload("*"): relationship chưa eager load bị truy cập sẽ raise (500)."""
+    with count_queries(session.connection()) as queries:
+        response = auth_client.get(f"/api/v1/vocabulary/export?format={format}")
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert len(queries) <= 3, queries
+
+
+def test_import_query_count(auth_client: TestClient, session: Session, normal_user):
+    """Import nhiều dòng dùng số query cố định: vocabularies và meanings được insert theo batch."""
+    existing_id = _bulk_seed(session, normal_user.id, {"word0": "def0"})[0]
+    session.commit()
+    
+    content = "\n".join(f"word{i}|meaning {i}" for i in range(500))
+    with count_queries(session.connection()) as queries:
         response = auth_client.post("/api/v1/vocabulary/import", json={
             "content": content,
             "auto_fetch_meaning": False
         })
-        
-        assert response.status_code == status.HTTP_200_OK
-        data = response.json()
-        assert data["total_processed"] == 2
-        assert data["new_words"] == 2
-        
-        # Kiểm tra DB
-        stmt = select(Vocabulary).where(Vocabulary.word == "apple").options(selectinload(Vocabulary.meanings))
-        vocab = session.exec(stmt).first()
-        assert vocab is not None
-        assert vocab.meanings[0].definition == "quả táo"
-        assert vocab.meanings[0].example_sentence == "I eat an apple"
-
-
-@pytest.mark.asyncio
-async def test_import_with_auto_meaning(auth_client: TestClient, session: Session):
-    """Test import có tự động fetch nghĩa khi thiếu."""
-    content = "strawberry"
-    
-    with patch("app.services.dictionary_service.DictionaryService.batch_get_definitions") as mock_batch:
-        mock_batch.return_value = {
-            "strawberry": ("A red fruit", MeaningSource.DICTIONARY_API)
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["new_words"] == 499
+    assert data["merged_meanings"] == 1
+    assert data["created_vocab_ids"][0] == existing_id
+    assert len(data["created_vocab_ids"]) == 500
+    assert len(queries) <= 6, queries
+
+
+@pytest.mark.slow
+def test_import_large_txt_perf(auth_client: TestClient):
+    """Import 10k dòng (parse bằng csv.reader + bulk insert) trong thời gian giới hạn."""
+    content = "\n".join(f"word{i}|def{i}|ex{i}" for i in range(10_000))
+    
+    start = time.perf_counter()
+    response = auth_client.post("/api/v1/vocabulary/import", json={
+        "content": content,
+        "auto_fetch_meaning": False
+    })
+    elapsed = time.perf_counter() - start
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["new_words"] == 10_000
+    assert elapsed < 2.0, f"Import 10k dòng mất {elapsed:.2f}s"
+
+
+def test_import_counts_existing_word_once(auth_client: TestClient, session: Session, normal_user):
+    """Import 2 dòng, một word đã có sẵn: chỉ tính 1 từ mới, dòng còn lại merge meaning."""
+    existing_id = _bulk_seed(session, normal_user.id, {"apple": "quả táo"})[0]
+    session.commit()
+    
+    response = auth_client.post("/api/v1/vocabulary/import", json={
+        "content": "apple|trái táo\nbanana|quả chuối",
+        "auto_fetch_meaning": False
+    })
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["new_words"] == 1
+    assert data["merged_meanings"] == 1
+    assert data["created_vocab_ids"][0] == existing_id
+
+
+def test_insert_vocabs_ignores_conflicts(session: Session, normal_user):
+    """Word đã tồn tại (vd: request khác vừa insert) bị ON CONFLICT bỏ qua thay vì IntegrityError."""
+    from app.services.vocabulary_service import VocabularyService
+    
+    now = datetime.utcnow()
+    existing_id = _bulk_seed(session, normal_user.id, {"apple": "quả táo"})[0]
+    rows = [
+        {
+            "user_id": normal_user.id, "word": word,
+            "word_type": WordType.CONTENT_WORD, "is_word_type_manual": False,
+            "easiness_factor": 2.5, "interval": 0, "repetitions": 0,
+            "next_review_date": now, "created_at": now, "updated_at": now,
         }
-        
-        response = auth_client.post("/api/v1/vocabulary/import", json={
-            "content": content,
-            "auto_fetch_meaning": True
-        })
-        
-        assert response.status_code == status.HTTP_200_OK
-        assert response.json()["auto_generated_count"] == 1
-        
-        # Kiểm tra DB
-        stmt = select(Vocabulary).where(Vocabulary.word == "strawberry").options(selectinload(Vocabulary.meanings))
-        vocab = session.exec(stmt).first()
-        assert vocab.meanings[0].definition == "A red fruit"
-        assert vocab.meanings[0].meaning_source == "dictionary_api"
-
-
-def test_export_vocabularies_json(auth_client: TestClient):
-    """Test export danh sách từ vựng sang JSON."""
-    # Tạo data
-    auth_client.post("/api/v1/vocabulary/", json={
-        "word": "export1", 
-        "meanings": [{"definition": "def1"}]
+        for word in ("apple", "banana")
+    ]
+    
+    ids, conflicted = VocabularyService(session)._insert_vocabs_ignore_existing(rows)
+    
+    assert conflicted == {"apple"}
+    assert "apple" not in ids
+    assert session.get(Vocabulary, ids["banana"]).word == "banana"
+    assert session.get(Vocabulary, existing_id).word == "apple"
+
+
+def test_import_existing_lookup_chunked(auth_client: TestClient, session: Session, normal_user, monkeypatch):
+    """Lookup word đã tồn tại chia IN list theo IN_CHUNK_SIZE mà vẫn merge đúng."""
+    from app.services.vocabulary_service import VocabularyService
+    
+    monkeypatch.setattr(VocabularyService, "IN_CHUNK_SIZE", 2)
+    existing_ids = _bulk_seed(session, normal_user.id, {"one": "1", "two": "2", "three": "3"})
+    session.commit()
+    
+    response = auth_client.post("/api/v1/vocabulary/import", json={
+        "content": "one|một\ntwo|hai\nthree|ba\nfour|bốn\nfive|năm",
+        "auto_fetch_meaning": False
     })
     
-    response = auth_client.get("/api/v1/vocabulary/export?format=json")
     assert response.status_code == status.HTTP_200_OK
-    assert response.headers["content-type"] == "application/json"
     data = response.json()
-    assert any(item["word"] == "export1" for item in data)
+    assert data["new_words"] == 2
+    assert data["merged_meanings"] == 3
+    assert data["created_vocab_ids"][:3] == existing_ids
 
 
-def test_export_vocabularies_txt(auth_client: TestClient):
-    """Test export sang format TXT."""
-    auth_client.post("/api/v1/vocabulary/", json={
-        "word": "export2", 
-        "meanings": [{"definition": "def2", "example_sentence": "ex2"}]
+def test_import_batch_insert_failure_reported(auth_client: TestClient, monkeypatch, fake_dictionary):
+    """Lỗi database khi batch insert được trả về trong errors (không phải 500), counters về 0."""
+    from sqlalchemy.exc import OperationalError
+    from app.services.vocabulary_service import VocabularyService
+    
+    def _fail(self, rows):
+        raise OperationalError("INSERT", {}, Exception("disk I/O error"))
+    
+    monkeypatch.setattr(VocabularyService, "_insert_vocabs_ignore_existing", _fail)
+    fake_dictionary.responses = {
+        "strawberry": ("A red fruit", MeaningSource.DICTIONARY_API)
+    }
+    
+    response = auth_client.post("/api/v1/vocabulary/import", json={
+        "content": "apple|quả táo\nstrawberry\nblueberry",
+        "auto_fetch_meaning": True
     })
     
-    response = auth_client.get("/api/v1/vocabulary/export?format=txt")
     assert response.status_code == status.HTTP_200_OK
-    assert "export2|def2|ex2" in response.text
+    data = response.json()
+    assert data["new_words"] == 0
+    assert data["auto_generated_count"] == 0
+    assert data["failed_auto_meaning"] == []
+    assert data["created_vocab_ids"] == []
+    assert any("Database error" in error for error in data["errors"])
+
+
+def test_import_oversized_field(auth_client: TestClient, session: Session):
+    """Field vượt giới hạn của csv.reader (128KB) vẫn được import như trước, không 500."""
+    long_definition = "x" * 200_000
+    
+    response = auth_client.post("/api/v1/vocabulary/import", json={
+        "content": f"apple|quả táo\nhuge|{long_definition}",
+        "auto_fetch_meaning": False
+    })
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["new_words"] == 2
+    vocabs = _fetch_vocabs(session, data["created_vocab_ids"])
+    assert vocabs["huge"].meanings[0].definition == long_definition
+
+
+def test_import_concurrent_insert_merges(auth_client: TestClient, session: Session, normal_user, monkeypatch):
+    """
+    Word được request khác tạo sau lookup ban đầu: ON CONFLICT bỏ qua, meaning được
+    dedupe theo database và tính là merge (không tạo meaning trùng).
+    """
+    from app.services.vocabulary_service import VocabularyService
+    
+    existing_id = _bulk_seed(session, normal_user.id, {"apple": "quả táo"})[0]
+    session.commit()
+    
+    # Giả lập race: lookup ban đầu chưa thấy "apple", các lần sau thấy bình thường
+    original_lookup = VocabularyService._get_vocabs_by_words
+    calls = []
+    
+    def _lookup(self, user_id, words):
+        calls.append(words)
+        return {} if len(calls) == 1 else original_lookup(self, user_id, words)
+    
+    monkeypatch.setattr(VocabularyService, "_get_vocabs_by_words", _lookup)
+    
+    response = auth_client.post("/api/v1/vocabulary/import", json={
+        "content": "apple|quả táo\napple|trái táo\nbanana|quả chuối",
+        "auto_fetch_meaning": False
+    })
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["new_words"] == 1
+    assert data["merged_meanings"] == 1
+    assert data["created_vocab_ids"][0] == existing_id
+    
+    session.expire_all()
+    vocabs = _fetch_vocabs(session, data["created_vocab_ids"])
+    assert sorted(m.definition for m in vocabs["apple"].meanings) == ["quả táo", "trái táo"]